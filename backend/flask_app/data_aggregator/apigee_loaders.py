@@ -1,37 +1,40 @@
 # backend/flask_app/data_aggregator/apigee_loaders.py
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Iterable
 from urllib.parse import urlparse
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
+import multiprocessing
 import os
-import time
-import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # ---- Your constants & helpers ----
 from .utils.apigee_constants import ENV_OBJ_DICT, SPLUNK_API_BY_ENV
 from .utils.apigee_utils import (
     initialize_apigee_obj,
     fetch_apigee_xml_data,
-    get_policy_analysis_dict,
-    get_virtual_host_analysis_dict,
+    fetch_apigee_bundle_data,
 )
-from .utils.network_utils import get_amex_proxies_verified
-
-try:
-    from amexcerts import certificate_path as _amex_cert_path
-except Exception:
-    _amex_cert_path = None
+from .utils.apigee_bundle import bundle_download_method
+from .utils.policy_classifier import get_policy_classifier
+from .utils.env_utils import get_env_float, get_env_int
+from .splunk_client import get_splunk_client
+from .splunk_sharding import time_slices, combine_partials, run_sliced
 
 # ====================== Small helpers ======================
 
-def _security_mechanism(policy_summary: Dict[str, Any], ssl_flags: Dict[str, Any]) -> str:
-    if policy_summary.get("oauthv2"): return "oauth2"
-    if policy_summary.get("verify_api_key"): return "apikey"
-    if policy_summary.get("hmac"): return "hmac"
-    if any(ssl_flags.get(k) for k in ("clientAuthRequired", "twoWaySSL", "mtls")): return "mtls"
-    return "unknown" if any([policy_summary.get("oauthv2"), policy_summary.get("verify_api_key"), policy_summary.get("hmac")]) else "none"
-
-def _first_target_host(targets: Optional[List[Dict[str, Any]]]) -> str:
+def _security_mechanism(security_types: Iterable[str], ssl_types: Iterable[str]) -> str:
+    # security_types / ssl_types: the sets PolicyClassifier.security_types_used / ssl_types_used return
+    security_types, ssl_types = set(security_types), set(ssl_types)
+    if "oauthv2" in security_types: return "oauth2"
+    if "verify_api_key" in security_types: return "apikey"
+    if "hmac" in security_types: return "hmac"
+    if "mtls" in ssl_types: return "mtls"
+    return "none"
+
+def _first_target_host(targets: Any) -> str:
+    # find_proxy_target_details returns {target name: {"url", "ssl_info"}}
+    if isinstance(targets, dict):
+        targets = targets.values()
     for t in targets or []:
         u = t.get("url")
         if u:
@@ -44,7 +47,9 @@ def _first_target_host(targets: Optional[List[Dict[str, Any]]]) -> str:
 def _phoenix_month(val: str) -> str:
     from datetime import datetime as _dt
     try:
-        dt = _dt.strptime(val, "%Y-%m-%d")
+        # already a calendar label (Splunk strftime) — don't shift it through a timezone
+        dt = _dt.strptime(str(val), "%Y-%m-%d")
+        return f"{dt.year:04d}-{dt.month:02d}-01"
     except Exception:
         try:
             dt = _dt.fromtimestamp(float(val), tz=timezone.utc)
@@ -75,136 +80,23 @@ def _resolve_splunk_host_for_env(env_key: str, explicit_host: str) -> str:
     port = cfg.get("port", 443)
     return f"{scheme}://{hostname}:{port}"
 
-def _splunk_bases(host: str) -> List[str]:
+def _iter_splunk(host: str, user: str, pwd: str, query: str, verify_tls: bool = True,
+                 use_cache: bool = True, status: Optional[Dict[str, bool]] = None) -> Iterator[Dict[str, Any]]:
     """
-    Try in order:
-      1) API VIP native REST (/services)
-      2) UI VIP raw proxy (/splunkd/__raw/services)
-      3) UI VIP locale+raw proxy (/en-US/splunkd/__raw/services)
-    The code auto-detects JSON vs HTML and falls back.
+    Runs a search through the shared SplunkClient for this host and yields result rows
+    as they are parsed. See SplunkClient.iter_search for the export / create+poll fallbacks.
+    Cached results are served, but a streamed result is not cached; _run_splunk caches.
+    use_cache=False bypasses the on-disk result cache (SPLUNK_CACHE_BYPASS does it globally).
+    status["ok"] is set once the search answered, so an empty stream can be told from a failed one.
     """
-    return [f"{host}/services", f"{host}/splunkd/__raw/services", f"{host}/en-US/splunkd/__raw/services"]
+    return get_splunk_client(host, user, pwd, verify_tls).iter_search(query, use_cache, status)
 
-def _run_splunk(host: str, user: str, pwd: str, query: str, verify_tls: bool = True) -> List[Dict[str, Any]]:
+def _run_splunk(host: str, user: str, pwd: str, query: str, verify_tls: bool = True,
+                use_cache: bool = True) -> List[Dict[str, Any]]:
     """
-    Creates a search job and returns results (JSON list).
-    - Respects HTTP(S)_PROXY env vars or Amex helper if provided.
-    - Tries multiple base paths automatically.
-    - Supports token auth via SPLUNK_TOKEN (preferred on corp networks).
+    Creates a search job and returns results (JSON list), through the result cache.
     """
-    sess = requests.Session()
-    # Prefer explicit Amex helper if creds are set; else honor generic env proxies
-    amex = get_amex_proxies_verified()
-    if amex:
-        sess.proxies.update(amex)
-        print("[splunk] using Amex corporate proxy")
-    else:
-        p_http = os.getenv("HTTP_PROXY"); p_https = os.getenv("HTTPS_PROXY")
-        if p_http or p_https:
-            sess.proxies.update({"http": p_http, "https": p_https})
-            print(f"[splunk] using proxy http={p_http!s} https={p_https!s}")
-
-    verify_param = _amex_cert_path() if (_amex_cert_path and verify_tls) else verify_tls
-
-    # Auth: prefer token header if provided
-    token = os.getenv("SPLUNK_TOKEN")
-    use_token = bool(token)
-    headers = {"Authorization": f"Splunk {token}", "Content-Type": "application/x-www-form-urlencoded"} if use_token else {}
-    auth = None if use_token else (user, pwd)
-
-    for base in _splunk_bases(host):
-        try:
-            # First, try export (oneshot) to avoid WAF redirects to HTML login pages
-            print(f"[splunk] EXPORT {base}/search/jobs/export (token={use_token})")
-            exp = sess.post(
-                f"{base}/search/jobs/export",
-                data={"search": f"search {query}", "output_mode": "json"},
-                headers=headers if use_token else None,
-                auth=auth,
-                timeout=60,
-                verify=verify_param,
-            )
-            ct = exp.headers.get("Content-Type", "")
-            print(f"[splunk] export status={exp.status_code} ct={ct}")
-            if exp.status_code == 200 and ct.lower().startswith("application/json"):
-                j = exp.json() or {}
-                results = j.get("results") if isinstance(j, dict) else None
-                if isinstance(results, list):
-                    return results
-                try:
-                    lines = [line for line in exp.text.splitlines() if line.strip()]
-                    parsed = []
-                    for ln in lines:
-                        try:
-                            parsed.append(requests.utils.json.loads(ln))
-                        except Exception:
-                            pass
-                    if parsed:
-                        return parsed
-                except Exception:
-                    pass
-            # Fall back to create + poll pattern
-            print(f"[splunk] POST {base}/search/jobs (token={use_token})")
-            r = sess.post(
-                f"{base}/search/jobs",
-                data={"search": f"search {query}", "output_mode": "json"},
-                headers=headers if use_token else None,
-                auth=auth, timeout=30, verify=verify_param,
-            )
-            print(f"[splunk] create status={r.status_code} ct={r.headers.get('Content-Type')}")
-            if r.status_code != 200:
-                print(f"[splunk] create body(head): {r.text[:200]}")
-                continue
-            if not r.headers.get("Content-Type", "").lower().startswith("application/json"):
-                print("[splunk] create returned non-JSON (likely WAF); trying next base")
-                continue
-            data = r.json() or {}
-            sid = data.get("sid")
-            if not sid:
-                print("[splunk] no SID in JSON — trying next base")
-                continue
-
-            for _ in range(300):
-                j = sess.get(
-                    f"{base}/search/jobs/{sid}",
-                    params={"output_mode": "json"},
-                    headers=headers if use_token else None,
-                    auth=auth, timeout=30, verify=verify_param,
-                )
-                if j.status_code != 200:
-                    print(f"[splunk] poll status={j.status_code} body(head): {j.text[:200]}")
-                    break
-                if not j.headers.get("Content-Type", "").lower().startswith("application/json"):
-                    print("[splunk] poll non-JSON — trying next base")
-                    break
-                jj = j.json() or {}
-                entry = (jj.get("entry") or [{}])[0]
-                if entry.get("content", {}).get("isDone"):
-                    break
-                time.sleep(1)
-
-            res = sess.get(
-                f"{base}/search/jobs/{sid}/results",
-                params={"output_mode": "json", "count": 50000},
-                headers=headers if use_token else None,
-                auth=auth, timeout=60, verify=verify_param,
-            )
-            print(f"[splunk] results status={res.status_code} ct={res.headers.get('Content-Type')}")
-            if res.status_code != 200:
-                print(f"[splunk] results body(head): {res.text[:200]}")
-                continue
-            if not res.headers.get("Content-Type", "").lower().startswith("application/json"):
-                print("[splunk] results non-JSON — trying next base")
-                continue
-
-            return (res.json() or {}).get("results", []) or []
-
-        except Exception as e:
-            print(f"[splunk] base={base} error: {e} — trying alternate base...")
-            continue
-
-    print("[splunk] all bases failed — check VPN/proxy/host/creds")
-    return []
+    return get_splunk_client(host, user, pwd, verify_tls).search(query, use_cache)
 
 def _spl_active_proxies_query(index: str) -> str:
     return f"""
@@ -215,9 +107,12 @@ def _spl_active_proxies_query(index: str) -> str:
     | fields apiproxy
     """
 
-# Metric SPL templates (index comes from .env so you can override easily)
+# Metric SPL templates (index comes from .env so you can override easily).
+# {earliest} bounds the scanned window. {history_earliest} is used by the first-seen
+# searches, which need the full lookback to tell whether a proxy/consumer is new.
+FULL_HISTORY_EARLIEST = "-13mon"
 SPL_ONBOARDED_TMPL = """
-index={index} sourcetype=api_proxy earliest=-13mon
+index={index} sourcetype=api_proxy earliest={history_earliest}
 | eval apiproxy=coalesce(apiproxy, apiProxy_proxyName)
 | stats earliest(_time) as first_seen by apiproxy
 | eval month=strftime(first_seen,"%Y-%m-01")
@@ -225,7 +120,7 @@ index={index} sourcetype=api_proxy earliest=-13mon
 | sort 0 month
 """
 SPL_TPS_TMPL = """
-index={index} sourcetype=api_proxy earliest=-13mon
+index={index} sourcetype=api_proxy earliest={earliest}
 | bin _time span=1s
 | stats count as rps by _time
 | eval month=strftime(_time,"%Y-%m-01")
@@ -233,7 +128,7 @@ index={index} sourcetype=api_proxy earliest=-13mon
 | sort 0 month
 """
 SPL_CONS_TMPL = """
-index={index} sourcetype=api_proxy earliest=-13mon
+index={index} sourcetype=api_proxy earliest={history_earliest}
 | eval month=strftime(_time,"%Y-%m-01")
 | eval consumer=coalesce('apigee.developer.app.name','apigee.client_id')
 | eventstats earliest(_time) as first_seen by consumer
@@ -241,12 +136,106 @@ index={index} sourcetype=api_proxy earliest=-13mon
 | stats sum(is_new) as new_consumers dc(consumer) as active_consumers by month
 | sort 0 month
 """
-SPL_TRAFFIC_TMPL = """
-index={index} sourcetype=api_proxy earliest=-13mon
+# Searches each `skip` group of fetch_apigee_monthlies removes.
+SKIPPABLE_SEARCHES = {"tps": ("tps",), "first_seen": ("onboarded", "cons")}
+
+# First-seen deltas for the proxy_first_seen / consumer_first_seen registries: the earliest
+# event per consumer inside [earliest, latest). Proxies use SPL_ONBOARDED_SHARD_TMPL, which
+# is the same search by apiproxy. Folded into the registries with least().
+SPL_CONSUMER_FIRST_SEEN_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| eval consumer=coalesce('apigee.developer.app.name','apigee.client_id')
+| where isnotnull(consumer)
+| stats min(_time) as first_seen by consumer
+"""
+
+# Volume, bytes, per-status counts and active consumers in a single scan of the events.
+# Used as-is by both the monolithic and the sliced paths ({latest} is "now" for the former).
+STATUS_COUNT_FIELDS = (
+    "success_200_count",
+    "failure_400_count",
+    "failure_401_count",
+    "failure_429_count",
+    "failure_500_count",
+    "failure_503_count",
+    "failure_504_count",
+)
+DEFAULT_STATUS_EXPR = "coalesce('response.status.code','message.status.code')"
+SPL_VOLUME_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| eval month=strftime(_time,"%Y-%m-01")
 | eval bytes_in=tonumber('request.header.contentLength'), bytes_out=tonumber('target.received.content.length')
-| timechart span=1mon count as requests sum(bytes_in) as bytes_in sum(bytes_out) as bytes_out
+| eval status=tonumber({status_expr})
+| eval consumer=coalesce('apigee.developer.app.name','apigee.client_id')
+| stats count as requests sum(bytes_in) as bytes_in sum(bytes_out) as bytes_out dc(consumer) as active_consumers
+    count(eval(status==200)) as success_200_count
+    count(eval(status==400)) as failure_400_count
+    count(eval(status==401)) as failure_401_count
+    count(eval(status==429)) as failure_429_count
+    count(eval(status==500)) as failure_500_count
+    count(eval(status==503)) as failure_503_count
+    count(eval(status==504)) as failure_504_count
+    by month
+"""
+# Per-proxy variant for enterprise_api_volume_metrics: one search for all proxies rather than
+# one per proxy. Only the columns that table stores are computed.
+SPL_VOLUME_BY_PROXY_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| eval apiproxy=coalesce(apiproxy, apiProxy_proxyName)
+| where isnotnull(apiproxy)
+| eval month=strftime(_time,"%Y-%m-01")
+| eval status=tonumber({status_expr})
+| stats count as requests
+    count(eval(status==200)) as success_200_count
+    count(eval(status==400)) as failure_400_count
+    count(eval(status==401)) as failure_401_count
+    count(eval(status==429)) as failure_429_count
+    count(eval(status==500)) as failure_500_count
+    count(eval(status==503)) as failure_503_count
+    count(eval(status==504)) as failure_504_count
+    by apiproxy month
 """
 
+# One day of per-second request counts folded to that day's peak / sum / active seconds.
+# No "by" clause, so a successful search always returns exactly one row (zeros on idle days).
+SPL_TPS_DAY_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| bin _time span=1s
+| stats count as rps by _time
+| stats max(rps) as peak_tps sum(rps) as rps_sum count as active_seconds
+"""
+
+# Distinct consumers of one day (optionally per proxy), for the consumer sketches.
+SPL_CONSUMERS_DAY_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| eval consumer=coalesce('apigee.developer.app.name','apigee.client_id')
+| where isnotnull(consumer)
+| eval apiproxy=coalesce(apiproxy, apiProxy_proxyName)
+| stats count by {group_by}
+"""
+
+# Slice-able variants of the templates above for splunk_sharding: each runs over one
+# [earliest, latest) slice and emits partial aggregates that combine across slices.
+# SPL_VOLUME_TMPL is already slice-able (everything but active_consumers is a sum).
+SPL_ONBOARDED_SHARD_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| eval apiproxy=coalesce(apiproxy, apiProxy_proxyName)
+| stats min(_time) as first_seen by apiproxy
+"""
+SPL_TPS_SHARD_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| bin _time span=1s
+| stats count as rps by _time
+| eval month=strftime(_time,"%Y-%m-01")
+| stats max(rps) as peak_tps sum(rps) as rps_sum count as active_seconds by month
+"""
+SPL_CONS_SHARD_TMPL = """
+index={index} sourcetype=api_proxy earliest={earliest} latest={latest}
+| eval consumer=coalesce('apigee.developer.app.name','apigee.client_id')
+| where isnotnull(consumer)
+| eval month=strftime(_time,"%Y-%m-01")
+| stats min(_time) as first_seen by consumer month
+"""
 def _list_active_proxies_from_splunk(env_key: str, splunk_host: str, user: str, pwd: str, verify_tls: bool) -> List[str]:
     index = os.getenv("APIGEE_SPLUNK_INDEX", f"2000004162_api_{env_key}_idx1")
     q = _spl_active_proxies_query(index)
@@ -276,7 +265,15 @@ def _latest_revision_from_sdk(apigee, proxy_name: str) -> Optional[str]:
 
 # ====================== Catalog (config/metadata) ======================
 
-def load_apigee_catalog(planet: str, org: str, env_key: str) -> List[Dict[str, Any]]:
+def load_apigee_catalog(planet: str, org: str, env_key: str,
+                        previous: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    One row per deployed (proxy, rev), each carrying its "revision". Raises RuntimeError when
+    Apigee cannot be initialised or discovery resolves no deployed proxies.
+    `previous` is {proxy: {revision: row}} from past runs: revisions are immutable, so a
+    revision harvested before keeps its row and is not re-fetched. A proxy whose new
+    revision fails to harvest keeps the row of its most recently harvested revision.
+    """
     # Resolve environment object (Hasan-style constant mapping)
     env_obj = ENV_OBJ_DICT.get(env_key) or ENV_OBJ_DICT.get((env_key or "").upper())
     if env_obj is None:
@@ -286,8 +283,8 @@ def load_apigee_catalog(planet: str, org: str, env_key: str) -> List[Dict[str, A
     try:
         apigee = initialize_apigee_obj(planet, org, env_obj)
     except Exception as e:
-        print(f"[catalog] Apigee init FAILED planet={planet} org={org} env={env_key} err={type(e).__name__}: {e}")
-        return []
+        raise RuntimeError(f"[catalog] Apigee init FAILED planet={planet} org={org} env={env_key} "
+                           f"err={type(e).__name__}: {e}") from e
 
     # Resolve Splunk host via mapping (or explicit SPLUNK_HOST in .env)
     from .config import load_settings
@@ -328,29 +325,106 @@ def load_apigee_catalog(planet: str, org: str, env_key: str) -> List[Dict[str, A
                     pairs.append((p, rev))
 
     if not pairs:
-        print(f"[catalog] No active proxies resolved for env '{env_key}'.")
-        return []
-
-    # Build rows
+        # an empty catalog would wipe the harvest state; treat it as a failed discovery
+        raise RuntimeError(f"[catalog] No active proxies resolved for env '{env_key}'.")
+
+    previous = previous or {}
+    stale = [(p, rev) for p, rev in pairs if str(rev) not in previous.get(p, {})]
+    if previous:
+        print(f"[catalog] {len(pairs) - len(stale)} of {len(pairs)} proxies unchanged since the last harvest")
+
+    # bundle mode: one export call per revision, XML parsed locally across processes
+    bundle_mode = os.getenv("APIGEE_HARVEST_MODE", "api").strip().lower() == "bundle"
+    if bundle_mode and bundle_download_method(apigee) is None:
+        print("[catalog] APIGEE_HARVEST_MODE=bundle but the Apigee SDK has no bundle export; using API mode")
+        bundle_mode = False
+
+    # Build rows concurrently for new/redeployed revisions only
+    harvested: Dict[Any, Optional[Dict[str, Any]]] = {}
+    if stale:
+        workers = min(get_env_int("APIGEE_CATALOG_WORKERS", 8), len(stale))
+        fetch_workers = get_env_int("APIGEE_PROXY_FETCH_WORKERS", 1)
+        parse_workers = get_env_int("APIGEE_BUNDLE_PARSE_WORKERS", os.cpu_count() or 1, minimum=0) if bundle_mode else 0
+        if bundle_mode:
+            print(f"[catalog] harvesting {len(stale)} proxy bundles with {workers} download worker(s), "
+                  f"{parse_workers or 'no'} parse process(es)")
+        else:
+            print(f"[catalog] harvesting {len(stale)} proxy revisions with {workers} worker(s), {fetch_workers} per proxy")
+        # the pool starts its workers lazily from the harvest threads; forking a threaded
+        # process can deadlock, so workers come from a forkserver (spawn where unavailable)
+        parse_pool = None
+        if parse_workers:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            parse_pool = ProcessPoolExecutor(max_workers=parse_workers,
+                                             mp_context=multiprocessing.get_context(start_method))
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog") as pool:
+                results = pool.map(lambda pair: _harvest_catalog_row(apigee, *pair, fetch_workers=fetch_workers,
+                                                                     cache_org=f"{planet}/{org}",
+                                                                     bundle=bundle_mode, parse_pool=parse_pool), stale)
+                harvested = dict(zip(stale, results))
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown()
+
+    # Keep the (proxy, rev) order of `pairs`
     rows: List[Dict[str, Any]] = []
-    for proxy, rev in pairs:
-        parsed, _xml = fetch_apigee_xml_data(apigee, proxy, rev)
-        pol = get_policy_analysis_dict(parsed["policies"])
-        ssl = get_virtual_host_analysis_dict(parsed["virtual_hosts"])
-        rows.append({
+    failed = carried = 0
+    for p, rev in pairs:
+        if (p, rev) not in harvested:
+            rows.append(previous[p][str(rev)])
+            continue
+        row = harvested[(p, rev)]
+        if row is None:
+            failed += 1
+            if previous.get(p):
+                row = next(iter(previous[p].values()))
+                carried += 1
+        if row is not None:
+            rows.append(row)
+    if failed:
+        print(f"[catalog] {failed} of {len(stale)} proxy revisions failed; "
+              f"{carried} kept their previous revision's row, {failed - carried} were skipped")
+        # only proxies missing from the catalog count; a carried row still covers its proxy
+        missing = failed - carried
+        max_ratio = get_env_float("APIGEE_CATALOG_MAX_FAILED_RATIO", 0.5)
+        if missing and (missing == len(pairs) or missing > max_ratio * len(pairs)):
+            raise RuntimeError(f"[catalog] {missing} of {len(pairs)} deployed proxies could not be harvested; "
+                               f"aborting rather than loading a partial catalog")
+    return rows
+
+def _harvest_catalog_row(apigee, proxy: str, rev: str, fetch_workers: int = 1, cache_org: Optional[str] = None,
+                         bundle: bool = False, parse_pool: Optional[ProcessPoolExecutor] = None) -> Optional[Dict[str, Any]]:
+    """
+    Fetches and analyses one (proxy, rev). Any error is logged and isolated to this proxy,
+    returning None, so a single bad revision cannot abort the run; load_apigee_catalog aborts
+    instead when failures pass APIGEE_CATALOG_MAX_FAILED_RATIO.
+    """
+    try:
+        if bundle:
+            parsed, _xml = fetch_apigee_bundle_data(apigee, proxy, rev, parse_pool=parse_pool, cache_org=cache_org)
+        else:
+            parsed, _xml = fetch_apigee_xml_data(apigee, proxy, rev, max_workers=fetch_workers, cache_org=cache_org)
+        classifier = get_policy_classifier()
+        security_types = classifier.security_types_used(parsed["policies"])
+        ssl_types = classifier.ssl_types_used(parsed["virtual_hosts"])
+        return {
             "apiproxy": proxy,
+            "revision": str(rev),
             "base_path": parsed.get("base_path") or parsed.get("BasePath") or parsed.get("proxy_base_path"),
             "target_host": _first_target_host(parsed.get("targets")),
-            "security_mechanism": _security_mechanism(pol, ssl),
+            "security_mechanism": _security_mechanism(security_types, ssl_types),
             "virtual_hosts": list(parsed.get("virtual_hosts") or []),
-            "ssl_profile_flags": ssl,
+            "ssl_profile_flags": {t: t in ssl_types for t in classifier.ssl_columns},
             "updated_at": datetime.now(timezone.utc).isoformat(),
-        })
-    return rows
+        }
+    except Exception as e:
+        print(f"[catalog] harvest FAILED proxy={proxy} rev={rev} err={type(e).__name__}: {e}")
+        return None
 
 # ====================== Metrics (monthly aggregations) ======================
 
-def _index_by_month(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+def _index_by_month(rows: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
     out: Dict[str, Dict[str, Any]] = {}
     for r in rows or []:
         m = r.get("month")
@@ -358,47 +432,83 @@ def _index_by_month(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
             out[_phoenix_month(m)] = {k: r[k] for k in r if k != "month"}
     return out
 
-def fetch_apigee_monthlies(splunk_host: str, splunk_user: str, splunk_password: str, verify_tls: bool = True) -> List[Dict[str, Any]]:
+def fetch_apigee_monthlies(splunk_host: str, splunk_user: str, splunk_password: str, verify_tls: bool = True,
+                           earliest: str = FULL_HISTORY_EARLIEST, skip: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Monthly platform metrics. `earliest` narrows the TPS/volume scans (e.g. "-1mon@mon" for
+    incremental runs); onboarded/new-consumer counts always look back FULL_HISTORY_EARLIEST
+    and are trimmed to the months of the narrowed window afterwards.
+    `skip` names figures the caller sources elsewhere (see SKIPPABLE_SEARCHES): "tps" for the
+    daily TPS rollup, "first_seen" for the first-seen registries.
+    """
     index = os.getenv("APIGEE_SPLUNK_INDEX", "2000004162_api_e3_idx1")
+    fmt = {
+        "index": index, "earliest": earliest, "latest": "now", "history_earliest": FULL_HISTORY_EARLIEST,
+        "status_expr": os.getenv("APIGEE_SPLUNK_STATUS_EXPR", DEFAULT_STATUS_EXPR),
+    }
 
-    def _safe(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    def _safe(results: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         try:
             return _index_by_month(results or [])
         except Exception:
             return {}
 
+    # Dispatch all searches together; wall-clock time is that of the slowest one.
+    queries = {
+        "onboarded": SPL_ONBOARDED_TMPL.format(**fmt),
+        "tps":       SPL_TPS_TMPL.format(**fmt),
+        "cons":      SPL_CONS_TMPL.format(**fmt),
+        "volume":    SPL_VOLUME_TMPL.format(**fmt),
+    }
+    for group in skip:
+        for name in SKIPPABLE_SEARCHES[group]:
+            queries.pop(name, None)
+    client = get_splunk_client(splunk_host, splunk_user, splunk_password, verify_tls)
     try:
-        onboarded = _safe(_run_splunk(splunk_host, splunk_user, splunk_password, SPL_ONBOARDED_TMPL.format(index=index), verify_tls))
-        tps       = _safe(_run_splunk(splunk_host, splunk_user, splunk_password, SPL_TPS_TMPL.format(index=index),       verify_tls))
-        cons      = _safe(_run_splunk(splunk_host, splunk_user, splunk_password, SPL_CONS_TMPL.format(index=index),      verify_tls))
-        traffic   = _safe(_run_splunk(splunk_host, splunk_user, splunk_password, SPL_TRAFFIC_TMPL.format(index=index),   verify_tls))
+        raw = client.run_searches(queries, max_concurrent=get_env_int("SPLUNK_MAX_CONCURRENT_SEARCHES", len(queries)))
+        results = {name: _safe(rows) for name, rows in raw.items()}
     except Exception as e:
         print(f"[metrics] Splunk query failed: {e}")
         return []
+    failed = sorted(name for name, rows in raw.items() if rows is None)
+    if failed:
+        # each search spans every month, so a failed one leaves no month complete
+        print(f"[metrics] Splunk searches failed: {', '.join(failed)}; no monthlies returned")
+        return []
+    onboarded, tps, cons, volume = (results.get(k, {}) for k in ("onboarded", "tps", "cons", "volume"))
 
     months = sorted(
         set((onboarded or {}).keys())
         | set((tps or {}).keys())
         | set((cons or {}).keys())
-        | set((traffic or {}).keys())
+        | set((volume or {}).keys())
     )
+    if earliest != FULL_HISTORY_EARLIEST:
+        # first-seen searches cover the full lookback; keep only months the window scanned
+        scanned = set((tps or {}).keys()) | set((volume or {}).keys())
+        months = [m for m in months if m in scanned]
+
+    return _merge_monthlies(months, onboarded, tps, cons, volume)
 
+def _to_ints(row: Dict[str, Any], fields: Iterable[str]) -> None:
+    for k in fields:
+        v = row.get(k)
+        if v not in (None, ""):
+            try:
+                row[k] = int(float(v))
+            except Exception:
+                pass
+
+def _merge_monthlies(months: Iterable[str], *parts: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for m in months:
         row: Dict[str, Any] = {"month": m}
-        row.update(onboarded.get(m, {}))
-        row.update(tps.get(m, {}))
-        row.update(cons.get(m, {}))
-        row.update(traffic.get(m, {}))
+        for part in parts:
+            row.update(part.get(m, {}))
 
         # normalize numeric types
-        for k in ("onboarded_apis", "peak_tps", "new_consumers", "active_consumers", "requests", "bytes_in", "bytes_out"):
-            v = row.get(k)
-            if v not in (None, ""):
-                try:
-                    row[k] = int(float(v))
-                except Exception:
-                    pass
+        _to_ints(row, ("onboarded_apis", "peak_tps", "new_consumers", "active_consumers", "requests", "bytes_in",
+                       "bytes_out", *STATUS_COUNT_FIELDS))
         v = row.get("avg_tps")
         if v not in (None, ""):
             try:
@@ -408,3 +518,219 @@ def fetch_apigee_monthlies(splunk_host: str, splunk_user: str, splunk_password:
 
         out.append(row)
     return out
+
+def fetch_apigee_daily_tps(splunk_host: str, splunk_user: str, splunk_password: str, verify_tls: bool,
+                           days: Iterable[date], tz: str = "America/Phoenix") -> Dict[str, Dict[str, Any]]:
+    """
+    Per-second TPS rollups for the given calendar days in `tz`, one single-day search per day
+    (run as parallel jobs). Returns {"YYYY-MM-DD": {peak_tps, rps_sum, active_seconds}};
+    days whose search failed are absent so the caller can retry them later.
+    """
+    index = os.getenv("APIGEE_SPLUNK_INDEX", "2000004162_api_e3_idx1")
+    queries: Dict[str, str] = {}
+    for d in days:
+        (earliest, latest), = time_slices(d, d + timedelta(days=1), "d", tz)
+        queries[d.strftime("%Y-%m-%d")] = SPL_TPS_DAY_TMPL.format(index=index, earliest=earliest, latest=latest)
+    if not queries:
+        return {}
+    print(f"[metrics] computing TPS rollups for {len(queries)} day(s)")
+    client = get_splunk_client(splunk_host, splunk_user, splunk_password, verify_tls)
+    try:
+        results = client.run_searches(queries, max_concurrent=get_env_int("SPLUNK_MAX_CONCURRENT_SEARCHES", 4))
+    except Exception as e:
+        print(f"[metrics] TPS rollup searches failed: {e}")
+        return {}
+    out: Dict[str, Dict[str, Any]] = {}
+    for day, rows in results.items():
+        if not rows:
+            continue
+        fields = ("peak_tps", "rps_sum", "active_seconds")
+        row = {k: rows[0].get(k) or 0 for k in fields}
+        _to_ints(row, fields)
+        out[day] = row
+    return out
+
+def fetch_apigee_daily_consumers(splunk_host: str, splunk_user: str, splunk_password: str, verify_tls: bool,
+                                 days: Iterable[date], tz: str = "America/Phoenix",
+                                 per_proxy: bool = False) -> Dict[str, Dict[str, set]]:
+    """
+    Distinct consumers per calendar day in `tz`, one single-day search per day. Returns
+    {"YYYY-MM-DD": {"": {consumers}, apiproxy: {consumers}, ...}}; the "" entry covers all
+    proxies and the per-proxy entries are present only with per_proxy. Days whose search
+    returned nothing are absent (failed or idle, either way worth retrying later).
+    """
+    index = os.getenv("APIGEE_SPLUNK_INDEX", "2000004162_api_e3_idx1")
+    group_by = "apiproxy consumer" if per_proxy else "consumer"
+    queries: Dict[str, str] = {}
+    for d in days:
+        (earliest, latest), = time_slices(d, d + timedelta(days=1), "d", tz)
+        queries[d.strftime("%Y-%m-%d")] = SPL_CONSUMERS_DAY_TMPL.format(
+            index=index, earliest=earliest, latest=latest, group_by=group_by)
+    if not queries:
+        return {}
+    print(f"[metrics] collecting distinct consumers for {len(queries)} day(s)")
+    client = get_splunk_client(splunk_host, splunk_user, splunk_password, verify_tls)
+    try:
+        results = client.run_searches(queries, max_concurrent=get_env_int("SPLUNK_MAX_CONCURRENT_SEARCHES", 4))
+    except Exception as e:
+        print(f"[metrics] consumer searches failed: {e}")
+        return {}
+    out: Dict[str, Dict[str, set]] = {}
+    for day, rows in results.items():
+        if not rows:
+            continue
+        groups: Dict[str, set] = {"": set()}
+        for r in rows:
+            consumer = r.get("consumer")
+            if not consumer:
+                continue
+            groups[""].add(consumer)
+            if per_proxy and r.get("apiproxy"):
+                groups.setdefault(r["apiproxy"], set()).add(consumer)
+        out[day] = groups
+    return out
+
+def fetch_first_seen_delta(splunk_host: str, splunk_user: str, splunk_password: str, verify_tls: bool,
+                           earliest: Any, latest: Any) -> Optional[Dict[str, Dict[str, datetime]]]:
+    """
+    Earliest event time per proxy and per consumer within [earliest, latest), as
+    {"proxy": {name: utc datetime}, "consumer": {...}}. Returns None when either search
+    failed or the proxy search comes back empty (the platform always has traffic, so that
+    means the search failed too): the registry must not be advanced past this window.
+    """
+    index = os.getenv("APIGEE_SPLUNK_INDEX", "2000004162_api_e3_idx1")
+    fmt = {"index": index, "earliest": earliest, "latest": latest}
+    queries = {
+        "proxy":    SPL_ONBOARDED_SHARD_TMPL.format(**fmt),
+        "consumer": SPL_CONSUMER_FIRST_SEEN_TMPL.format(**fmt),
+    }
+    client = get_splunk_client(splunk_host, splunk_user, splunk_password, verify_tls)
+    try:
+        results = client.run_searches(queries, max_concurrent=get_env_int("SPLUNK_MAX_CONCURRENT_SEARCHES", len(queries)))
+    except Exception as e:
+        print(f"[metrics] first-seen searches failed: {e}")
+        return None
+    if any(rows is None for rows in results.values()):
+        print("[metrics] first-seen searches failed; not advancing the registry")
+        return None
+    if not results.get("proxy"):
+        print("[metrics] first-seen proxy search returned nothing; treating it as failed")
+        return None
+    out: Dict[str, Dict[str, datetime]] = {}
+    for registry, key in (("proxy", "apiproxy"), ("consumer", "consumer")):
+        seen: Dict[str, datetime] = {}
+        for r in results.get(registry) or []:
+            try:
+                ts = datetime.fromtimestamp(float(r.get("first_seen")), tz=timezone.utc)
+            except (TypeError, ValueError):
+                continue
+            if r.get(key):
+                seen[r[key]] = min(seen.get(r[key], ts), ts)
+        out[registry] = seen
+    return out
+
+def iter_apigee_proxy_monthlies(splunk_host: str, splunk_user: str, splunk_password: str, verify_tls: bool = True,
+                                earliest: str = FULL_HISTORY_EARLIEST,
+                                status: Optional[Dict[str, bool]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Monthly request and status counts per proxy ({apiproxy, month, requests, *STATUS_COUNT_FIELDS})
+    from a single `by apiproxy month` search. Rows are yielded as Splunk streams them, so
+    callers can write them out in batches without holding the whole result.
+    status["ok"] is set once the stream is exhausted if the search succeeded; a search that
+    failed on every base yields nothing and leaves it unset.
+    """
+    index = os.getenv("APIGEE_SPLUNK_INDEX", "2000004162_api_e3_idx1")
+    q = SPL_VOLUME_BY_PROXY_TMPL.format(
+        index=index, earliest=earliest, latest="now",
+        status_expr=os.getenv("APIGEE_SPLUNK_STATUS_EXPR", DEFAULT_STATUS_EXPR),
+    )
+    for r in _iter_splunk(splunk_host, splunk_user, splunk_password, q, verify_tls, status=status):
+        if not r.get("apiproxy") or not r.get("month"):
+            continue
+        row = {k: r.get(k) for k in ("requests", *STATUS_COUNT_FIELDS)}
+        row.update(apiproxy=r["apiproxy"], month=_phoenix_month(r["month"]))
+        _to_ints(row, ("requests", *STATUS_COUNT_FIELDS))
+        yield row
+
+def fetch_apigee_monthlies_sharded(splunk_host: str, splunk_user: str, splunk_password: str, verify_tls: bool,
+                                   start: date, end: date, span: str = "mon", tz: str = "America/Phoenix",
+                                   history_start: Optional[date] = None, skip: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Same rows as fetch_apigee_monthlies for the months in [start, end), computed from
+    month- or day-sized slices run as parallel jobs. TPS/volume slices cover [start, end);
+    first-seen slices cover [history_start, end) so "new" is judged against full history.
+    Partials combine as: sums add, peaks take the max, first-seen takes the min, and
+    distinct consumers are counted from the merged (consumer, month) pairs. With "first_seen"
+    in `skip` the consumer slices only cover the window and yield active_consumers alone.
+    Months touched by a failed window slice are left out; a failed first-seen slice skews
+    every later month, so it fails the whole fetch.
+    """
+    index = os.getenv("APIGEE_SPLUNK_INDEX", "2000004162_api_e3_idx1")
+    window = time_slices(start, end, span, tz)
+    history = time_slices(history_start or start, end, span, tz)
+    templates = {
+        "onboarded": SPL_ONBOARDED_SHARD_TMPL,
+        "tps":       SPL_TPS_SHARD_TMPL,
+        "cons":      SPL_CONS_SHARD_TMPL,
+        "volume":    SPL_VOLUME_TMPL,
+    }
+    registry = "first_seen" in skip
+    if "tps" in skip:
+        del templates["tps"]
+    if registry:
+        del templates["onboarded"]
+    slices = {"onboarded": history, "cons": window if registry else history, "tps": window, "volume": window}
+    client = get_splunk_client(splunk_host, splunk_user, splunk_password, verify_tls)
+    failed: Dict[str, List[Any]] = {}
+    try:
+        fmt = {"index": index, "status_expr": os.getenv("APIGEE_SPLUNK_STATUS_EXPR", DEFAULT_STATUS_EXPR)}
+        parts = run_sliced(client, templates, fmt, slices,
+                           max_concurrent=get_env_int("SPLUNK_MAX_CONCURRENT_SEARCHES", 4), failed=failed)
+    except Exception as e:
+        print(f"[metrics] sliced Splunk queries failed: {e}")
+        return []
+    if "onboarded" in failed or ("cons" in failed and not registry):
+        print(f"[metrics] first-seen slices failed for {sorted(failed)}; no monthlies returned")
+        return []
+    incomplete = {_phoenix_month(ts) for spans in failed.values() for span in spans for ts in (span[0], span[1] - 1)}
+    if incomplete:
+        print(f"[metrics] sliced searches failed; leaving out {', '.join(sorted(incomplete))}")
+
+    tps: Dict[str, Dict[str, Any]] = {}
+    for r in combine_partials(parts.get("tps", []), ("month",), {"peak_tps": "max", "rps_sum": "sum", "active_seconds": "sum"}):
+        secs = r.get("active_seconds") or 0
+        tps[_phoenix_month(r["month"])] = {
+            "peak_tps": r.get("peak_tps"),
+            "avg_tps": (r.get("rps_sum") or 0) / secs if secs else None,
+        }
+
+    # active_consumers is a dc() and is left out here; it comes from the consumer pairs below
+    volume_spec = {k: "sum" for k in ("requests", "bytes_in", "bytes_out", *STATUS_COUNT_FIELDS)}
+    volume: Dict[str, Dict[str, Any]] = {}
+    for r in combine_partials(parts["volume"], ("month",), volume_spec):
+        volume[_phoenix_month(r["month"])] = {k: r.get(k) for k in volume_spec}
+
+    onboarded: Dict[str, Dict[str, Any]] = {}
+    for r in combine_partials(parts.get("onboarded", []), ("apiproxy",), {"first_seen": "min"}):
+        if r.get("first_seen") is not None:
+            m = onboarded.setdefault(_phoenix_month(r["first_seen"]), {"onboarded_apis": 0})
+            m["onboarded_apis"] += 1
+
+    # dc() cannot be merged across slices: count consumers from the merged (consumer, month) pairs
+    active: Dict[str, set] = {}
+    first_seen: Dict[str, float] = {}
+    for r in combine_partials(parts["cons"], ("consumer", "month"), {"first_seen": "min"}):
+        active.setdefault(_phoenix_month(r["month"]), set()).add(r["consumer"])
+        if r.get("first_seen") is not None:
+            first_seen[r["consumer"]] = min(first_seen.get(r["consumer"], r["first_seen"]), r["first_seen"])
+    new_by_month: Dict[str, int] = {}
+    for ts in first_seen.values():
+        m = _phoenix_month(ts)
+        new_by_month[m] = new_by_month.get(m, 0) + 1
+    cons = {m: {"new_consumers": new_by_month.get(m, 0), "active_consumers": len(c)} for m, c in active.items()}
+    if registry:
+        for c in cons.values():
+            del c["new_consumers"]
+
+    months = sorted((set(tps) | set(volume)) - incomplete)
+    return _merge_monthlies(months, onboarded, tps, cons, volume)
@@ -1,4 +1,26 @@
-from .db import get_conn, upsert_apigee_config_data, upsert_apigee_metrics, upsert_enterprise_api_apigee_metadata, upsert_enterprise_api_volume_metrics
+from .db import (
+    get_conn,
+    upsert_apigee_config_data,
+    upsert_apigee_metrics,
+    upsert_enterprise_api_apigee_metadata,
+    upsert_enterprise_api_volume_metrics,
+    drop_volume_metric_partitions_before,
+    check_volume_metric_writes,
+    get_finalized_metric_months,
+    mark_metric_months_finalized,
+    get_tps_rollup_days,
+    upsert_apigee_tps_daily,
+    get_monthly_tps,
+    get_first_seen_synced_through,
+    upsert_first_seen,
+    get_monthly_first_seen_counts,
+    get_consumer_sketch_days,
+    upsert_consumer_sketches,
+    get_consumer_sketches,
+    get_catalog_harvest_state,
+    upsert_catalog_harvest_state,
+)
+from .migrate import apply_migrations
  
 __all__ = [
     "get_conn",
@@ -6,4 +28,20 @@ __all__ = [
     "upsert_apigee_metrics",
     "upsert_enterprise_api_apigee_metadata",
     "upsert_enterprise_api_volume_metrics",
+    "drop_volume_metric_partitions_before",
+    "check_volume_metric_writes",
+    "get_finalized_metric_months",
+    "mark_metric_months_finalized",
+    "get_tps_rollup_days",
+    "upsert_apigee_tps_daily",
+    "get_monthly_tps",
+    "get_first_seen_synced_through",
+    "upsert_first_seen",
+    "get_monthly_first_seen_counts",
+    "get_consumer_sketch_days",
+    "upsert_consumer_sketches",
+    "get_consumer_sketches",
+    "get_catalog_harvest_state",
+    "upsert_catalog_harvest_state",
+    "apply_migrations",
 ] 
\ No newline at end of file
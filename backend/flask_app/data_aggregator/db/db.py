@@ -1,11 +1,30 @@
 # pg8000-only DB helpers + upserts
 import os, re, json
+import weakref
 from contextlib import contextmanager
+from functools import lru_cache
 from urllib.parse import urlparse, unquote
-from pg8000 import dbapi as pg
+
+from .migrate import apply_migrations
+from .pool import execute_prepared, get_pool
 
 
 def _conn_params(url: str = None):
+    if url is None:
+        url = os.getenv("AGG_PG_URL")
+    return dict(_parse_conn_params(url or None, *(os.getenv(k) for k in _DB_ENV_VARS)))
+
+
+_DB_ENV_VARS = ("DB_NAME", "DB_USER", "DB_PASSWORD", "DB_SECRET", "DB_HOST", "DB_PORT")
+
+
+@lru_cache(maxsize=None)
+def _parse_conn_params(url, *_env) -> tuple:
+    # cached on the URL and the DB_* values, so repeated get_conn calls skip the parsing
+    return tuple(_conn_params_uncached(url).items())
+
+
+def _conn_params_uncached(url: str = None):
     if url is None:
         url = os.getenv("AGG_PG_URL")
     if url:
@@ -30,39 +49,192 @@ def _conn_params(url: str = None):
     return dict(user=user, password=pwd, host=host, port=port, database=name)
 
 
+# databases (host, port, name) whose migrations were checked by this process
+_SCHEMA_CHECKED: set = set()
+
+
+def _ensure_schema(conn, params: dict):
+    key = (params["host"], params["port"], params["database"])
+    if key in _SCHEMA_CHECKED or os.getenv("AGG_DB_AUTO_MIGRATE", "true").strip().lower() in ("0", "false", "no"):
+        return
+    apply_migrations(conn)
+    conn.commit()
+    _SCHEMA_CHECKED.add(key)
+
+
+# connection -> (on_commit, on_rollback) callbacks for its open get_conn transaction
+_TXN_HOOKS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _on_transaction_end(conn, on_commit, on_rollback) -> None:
+    """Runs on_commit() once the get_conn transaction on conn commits, on_rollback() if it does not."""
+    _TXN_HOOKS.setdefault(conn, []).append((on_commit, on_rollback))
+
+
 @contextmanager
 
 def get_conn(pg_url: str = None):
+    """
+    Transaction on a pooled connection: committed on success, rolled back on error, then
+    returned to the pool (or closed if it could not be rolled back).
+    """
     params = _conn_params(pg_url)
-    conn = pg.connect(**params)
+    pool = get_pool(params)
+    conn = pool.acquire()
+    reusable = True
     try:
+        _ensure_schema(conn, params)
         yield conn
         conn.commit()
+        for on_commit, _ in _TXN_HOOKS.pop(conn, ()):
+            on_commit()
     except:
-        conn.rollback()
+        for _, on_rollback in _TXN_HOOKS.pop(conn, ()):
+            on_rollback()
+        try:
+            conn.rollback()
+        except Exception:
+            reusable = False
         raise
     finally:
-        conn.close()
+        pool.release(conn, discard=not reusable)
+
+
+def _execute_paged(cur, insert_sql: str, conflict_sql: str, data: list[tuple], page_size: int) -> list[tuple]:
+    """
+    Sends `data` as multi-row INSERT ... VALUES statements of up to page_size rows each,
+    i.e. one round trip per page instead of one per row as with executemany.
+    Returns the rows of a RETURNING clause in conflict_sql (empty without one).
+    """
+    returned = []
+    if not data:
+        return returned
+    row_ph = "(" + ",".join(["%s"] * len(data[0])) + ")"
+    for i in range(0, len(data), page_size):
+        page = data[i:i + page_size]
+        # full pages share one statement text, so they reuse one prepared statement
+        returned.extend(execute_prepared(
+            cur, f"{insert_sql} values {','.join([row_ph] * len(page))} {conflict_sql}",
+            [v for row in page for v in row],
+        ))
+    return returned
+
+
+def _csv_field(v) -> str:
+    # strings always quoted, None left bare: COPY csv reads "" as '' and a bare field as NULL
+    if v is None:
+        return ""
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return str(v)
+    return '"' + str(v).replace('"', '""') + '"'
+
+
+def _csv_chunks(data: list[tuple], chunk_bytes: int = 65536):
+    """COPY ... (format csv) input for `data`, yielded in chunks as it is produced."""
+    buf = []
+    size = 0
+    for row in data:
+        line = ",".join(_csv_field(v) for v in row) + "\n"
+        buf.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def _copy_merge(cur, table: str, columns: list[str], data: list[tuple], conflict_sql: str,
+                key: list[str], conflict_target: dict[str, tuple[str, str]] | None = None) -> tuple[int, list[tuple]]:
+    """
+    Streams `data` with COPY into a temp staging table shaped like `table` (types only, no
+    constraints or defaults), then merges it with one INSERT ... SELECT ... ON CONFLICT.
+    Returns how many staged rows already had their conflict key (see _write_rows) before the
+    merge, and the rows of a RETURNING clause in conflict_sql.
+    """
+    cols = ", ".join(columns)
+    stage = f"_stage_{table}"
+    cur.execute(f"create temp table if not exists {stage} on commit drop as select {cols} from {table} with no data")
+    cur.execute(f"truncate {stage}")
+    cur.execute(f"copy {stage} ({cols}) from stdin with (format csv)", stream=_csv_chunks(data))
+    targets, exprs = _key_match(key, conflict_target)
+    staged = ", ".join(e.format(f"s.{k}") for k, e in zip(key, exprs))
+    cur.execute(f"select count(*) from {table} t where {targets} in (select {staged} from {stage} s)")
+    (existing,), = cur.fetchall()
+    cur.execute(f"insert into {table} as t ({cols}) select {cols} from {stage} {conflict_sql}")
+    return existing, (cur.fetchall() if cur.description else [])
+
+
+def _key_match(key: list[str], conflict_target: dict[str, tuple[str, str]] | None) -> tuple[str, list[str]]:
+    """
+    The conflict key as a row of target columns, plus one SQL template per key column that
+    turns a source value ("{}") into that column's value.
+    """
+    conflict_target = conflict_target or {}
+    targets, exprs = [], []
+    for k in key:
+        target, expr = conflict_target.get(k, (k, "{}"))
+        targets.append(f"t.{target}")
+        exprs.append(expr)
+    return f"({', '.join(targets)})", exprs
+
+
+def _count_existing_paged(cur, table: str, key: list[str], conflict_target, data: list[tuple],
+                          idx: list[int], page_size: int) -> int:
+    """How many `data` rows already have their conflict key in `table`, one query per page."""
+    targets, exprs = _key_match(key, conflict_target)
+    row_ph = "(" + ", ".join(e.format("%s") for e in exprs) + ")"
+    existing = 0
+    for i in range(0, len(data), page_size):
+        page = data[i:i + page_size]
+        (n,), = execute_prepared(
+            cur, f"select count(*) from {table} t where {targets} in ({', '.join([row_ph] * len(page))})",
+            [row[j] for row in page for j in idx],
+        )
+        existing += n
+    return existing
+
+
+def _write_rows(cur, table: str, columns: list[str], key: list[str], data: list[tuple], conflict_sql: str,
+                bulk: bool = False, page_size: int = 1000,
+                conflict_target: dict[str, tuple[str, str]] | None = None) -> dict[str, int]:
+    """
+    Upserts `data` (tuples in `columns` order) into `table`. Rows repeating a `key` are
+    collapsed first, last one winning, since one statement may not touch a key twice.
+    bulk=False sends multi-row INSERT pages; bulk=True uses COPY + one set-based merge,
+    which is far fewer round trips for large batches.
+    The target is aliased `t`. conflict_sql should only update rows whose payload differs
+    (`where (t. ...) is distinct from (excluded. ...)`), so each row is counted as inserted,
+    updated, or unchanged (not returned at all).
+    Inserts are told apart from updates by counting, just before the merge, the rows whose
+    key already exists; system columns such as xmax cannot be returned from a partitioned
+    table. `key` must match the ON CONFLICT target; conflict_target maps a key column whose
+    target is a derived column to (target column, SQL template over the value), e.g.
+    {"proxy_name": ("proxy_key", "coalesce({}, '')")} for a generated key column.
+    """
+    idx = [columns.index(k) for k in key]
+    data = list({tuple(row[i] for i in idx): row for row in data}.values())
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not data:
+        return counts
+    conflict_sql = f"{conflict_sql} returning 1"
+    if bulk:
+        existing, returned = _copy_merge(cur, table, columns, data, conflict_sql, key, conflict_target)
+    else:
+        existing = _count_existing_paged(cur, table, key, conflict_target, data, idx, page_size)
+        returned = _execute_paged(cur, f"insert into {table} as t ({', '.join(columns)})", conflict_sql, data, page_size)
+    counts["inserted"] = len(data) - existing
+    counts["updated"] = len(returned) - counts["inserted"]
+    counts["unchanged"] = len(data) - len(returned)
+    return counts
 
 
 # ================== Legacy tables (kept for compatibility) ==================
 
-def upsert_apigee_config_data(conn, rows: list[dict]):
-    cur = conn.cursor()
-    cur.execute("""
-    create table if not exists apigee_config_data(
-      apiproxy text primary key,
-      base_path text,
-      target_host text,
-      security_mechanism text,
-      virtual_hosts jsonb,
-      ssl_profile_flags jsonb,
-      consumer_count int,
-      developer_apps jsonb,
-      updated_at timestamptz not null default now()
-    )""")
+def upsert_apigee_config_data(conn, rows: list[dict], bulk: bool = False) -> dict[str, int]:
     if not rows:
-        cur.close(); return
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+    cur = conn.cursor()
     data = []
     for r in rows:
         data.append((
@@ -74,10 +246,10 @@ def upsert_apigee_config_data(conn, rows: list[dict]):
             json.dumps(r.get("ssl_profile_flags") or {}),
             r.get("updated_at"),
         ))
-    cur.executemany("""
-    insert into apigee_config_data
-      (apiproxy, base_path, target_host, security_mechanism, virtual_hosts, ssl_profile_flags, updated_at)
-    values (%s,%s,%s,%s,%s::jsonb,%s::jsonb,%s)
+    counts = _write_rows(
+        cur, "apigee_config_data",
+        ["apiproxy", "base_path", "target_host", "security_mechanism", "virtual_hosts", "ssl_profile_flags", "updated_at"],
+        ["apiproxy"], data, """
     on conflict (apiproxy) do update set
       base_path=excluded.base_path,
       target_host=excluded.target_host,
@@ -85,26 +257,19 @@ def upsert_apigee_config_data(conn, rows: list[dict]):
       virtual_hosts=excluded.virtual_hosts,
       ssl_profile_flags=excluded.ssl_profile_flags,
       updated_at=excluded.updated_at
-    """, data)
+    where (t.base_path, t.target_host, t.security_mechanism, t.virtual_hosts, t.ssl_profile_flags)
+      is distinct from
+          (excluded.base_path, excluded.target_host, excluded.security_mechanism,
+           excluded.virtual_hosts, excluded.ssl_profile_flags)
+    """, bulk=bulk)
     cur.close()
+    return counts
 
 
-def upsert_apigee_metrics(conn, rows: list[dict]):
-    cur = conn.cursor()
-    cur.execute("""
-    create table if not exists apigee_metrics(
-      month date primary key,
-      onboarded_apis int,
-      peak_tps int,
-      avg_tps numeric(10,2),
-      new_consumers int,
-      active_consumers int,
-      requests bigint,
-      bytes_in bigint,
-      bytes_out bigint
-    )""")
+def upsert_apigee_metrics(conn, rows: list[dict], bulk: bool = False) -> dict[str, int]:
     if not rows:
-        cur.close(); return
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+    cur = conn.cursor()
     data = []
     for r in rows:
         data.append((
@@ -118,10 +283,11 @@ def upsert_apigee_metrics(conn, rows: list[dict]):
             r.get("bytes_in"),
             r.get("bytes_out"),
         ))
-    cur.executemany("""
-    insert into apigee_metrics
-      (month,onboarded_apis,peak_tps,avg_tps,new_consumers,active_consumers,requests,bytes_in,bytes_out)
-    values (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    counts = _write_rows(
+        cur, "apigee_metrics",
+        ["month", "onboarded_apis", "peak_tps", "avg_tps", "new_consumers", "active_consumers",
+         "requests", "bytes_in", "bytes_out"],
+        ["month"], data, """
     on conflict (month) do update set
       onboarded_apis=excluded.onboarded_apis,
       peak_tps=excluded.peak_tps,
@@ -131,36 +297,22 @@ def upsert_apigee_metrics(conn, rows: list[dict]):
       requests=excluded.requests,
       bytes_in=excluded.bytes_in,
       bytes_out=excluded.bytes_out
-    """, data)
+    where (t.onboarded_apis, t.peak_tps, t.avg_tps, t.new_consumers,
+           t.active_consumers, t.requests, t.bytes_in, t.bytes_out)
+      is distinct from
+          (excluded.onboarded_apis, excluded.peak_tps, excluded.avg_tps, excluded.new_consumers,
+           excluded.active_consumers, excluded.requests, excluded.bytes_in, excluded.bytes_out)
+    """, bulk=bulk)
     cur.close()
+    return counts
 
 
 # ================== New enterprise tables ==================
 
-def upsert_enterprise_api_apigee_metadata(conn, rows: list[dict]):
-    cur = conn.cursor()
-    cur.execute("""
-    create table if not exists enterprise_api_apigee_metadata(
-      id bigserial primary key,
-      org_name text not null,
-      env_name text not null,
-      central_id text,
-      proxy_name text not null,
-      proxy_base_path text,
-      proxy_resource_path text,
-      security_mechanism text,
-      backend_target_path text,
-      rate_limit text,
-      io_timeout int,
-      connect_timeout int,
-      developer_name text,
-      developer_app_name text,
-      created_at timestamptz not null default now(),
-      updated_at timestamptz not null default now(),
-      unique (org_name, env_name, proxy_name)
-    )""")
+def upsert_enterprise_api_apigee_metadata(conn, rows: list[dict], bulk: bool = False) -> dict[str, int]:
     if not rows:
-        cur.close(); return
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+    cur = conn.cursor()
     data = []
     for r in rows:
         data.append((
@@ -178,16 +330,13 @@ def upsert_enterprise_api_apigee_metadata(conn, rows: list[dict]):
             r.get("developer_name"),
             r.get("developer_app_name"),
         ))
-    cur.executemany("""
-    insert into enterprise_api_apigee_metadata (
-      org_name, env_name, central_id, proxy_name, proxy_base_path, proxy_resource_path,
-      security_mechanism, backend_target_path, rate_limit, io_timeout, connect_timeout,
-      developer_name, developer_app_name
-    ) values (
-      %s,%s,%s,%s,%s,%s,
-      %s,%s,%s,%s,%s,
-      %s,%s
-    ) on conflict (org_name, env_name, proxy_name) do update set
+    counts = _write_rows(
+        cur, "enterprise_api_apigee_metadata",
+        ["org_name", "env_name", "central_id", "proxy_name", "proxy_base_path", "proxy_resource_path",
+         "security_mechanism", "backend_target_path", "rate_limit", "io_timeout", "connect_timeout",
+         "developer_name", "developer_app_name"],
+        ["org_name", "env_name", "proxy_name"], data, """
+    on conflict (org_name, env_name, proxy_name) do update set
       central_id=excluded.central_id,
       proxy_base_path=excluded.proxy_base_path,
       proxy_resource_path=excluded.proxy_resource_path,
@@ -199,41 +348,28 @@ def upsert_enterprise_api_apigee_metadata(conn, rows: list[dict]):
       developer_name=excluded.developer_name,
       developer_app_name=excluded.developer_app_name,
       updated_at=now()
-    """, data)
+    where (t.central_id, t.proxy_base_path, t.proxy_resource_path, t.security_mechanism, t.backend_target_path,
+           t.rate_limit, t.io_timeout, t.connect_timeout, t.developer_name, t.developer_app_name)
+      is distinct from
+          (excluded.central_id, excluded.proxy_base_path, excluded.proxy_resource_path, excluded.security_mechanism,
+           excluded.backend_target_path, excluded.rate_limit, excluded.io_timeout, excluded.connect_timeout,
+           excluded.developer_name, excluded.developer_app_name)
+    """, bulk=bulk)
     cur.close()
+    return counts
 
 
-def upsert_enterprise_api_volume_metrics(conn, rows: list[dict]):
-    cur = conn.cursor()
-    cur.execute("""
-    create table if not exists enterprise_api_volume_metrics(
-      id bigserial primary key,
-      gateway_name text not null,
-      proxy_name text,
-      central_id text,
-      proxy_uri text,
-      start_date date not null,
-      end_date date not null,
-      volume bigint,
-      success_200_count bigint,
-      failure_401_count bigint,
-      failure_400_count bigint,
-      failure_500_count bigint,
-      failure_503_count bigint,
-      failure_504_count bigint,
-      failure_429_count bigint,
-      created_at timestamptz not null default now(),
-      updated_at timestamptz not null default now(),
-      unique (gateway_name, proxy_name, central_id, start_date, end_date)
-    )""")
+def upsert_enterprise_api_volume_metrics(conn, rows: list[dict], bulk: bool = False) -> dict[str, int]:
     if not rows:
-        cur.close(); return
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+    cur = conn.cursor()
+    ensure_volume_metric_partitions(cur, {r.get("start_date") for r in rows})
     data = []
     for r in rows:
         data.append((
             r.get("gateway_name"),
-            r.get("proxy_name"),
-            r.get("central_id"),
+            r.get("proxy_name") or None,  # '' and NULL share one key (proxy_key / central_key)
+            r.get("central_id") or None,
             r.get("proxy_uri"),
             r.get("start_date"),
             r.get("end_date"),
@@ -246,16 +382,13 @@ def upsert_enterprise_api_volume_metrics(conn, rows: list[dict]):
             r.get("failure_504_count"),
             r.get("failure_429_count"),
         ))
-    cur.executemany("""
-    insert into enterprise_api_volume_metrics (
-      gateway_name, proxy_name, central_id, proxy_uri, start_date, end_date,
-      volume, success_200_count, failure_401_count, failure_400_count, failure_500_count,
-      failure_503_count, failure_504_count, failure_429_count
-    ) values (
-      %s,%s,%s,%s,%s,%s,
-      %s,%s,%s,%s,%s,
-      %s,%s,%s
-    ) on conflict (gateway_name, proxy_name, central_id, start_date, end_date) do update set
+    counts = _write_rows(
+        cur, "enterprise_api_volume_metrics",
+        ["gateway_name", "proxy_name", "central_id", "proxy_uri", "start_date", "end_date",
+         "volume", "success_200_count", "failure_401_count", "failure_400_count", "failure_500_count",
+         "failure_503_count", "failure_504_count", "failure_429_count"],
+        ["gateway_name", "proxy_name", "central_id", "start_date", "end_date"], data, """
+    on conflict (gateway_name, proxy_key, central_key, start_date, end_date) do update set
       proxy_uri=excluded.proxy_uri,
       volume=excluded.volume,
       success_200_count=excluded.success_200_count,
@@ -266,5 +399,330 @@ def upsert_enterprise_api_volume_metrics(conn, rows: list[dict]):
       failure_504_count=excluded.failure_504_count,
       failure_429_count=excluded.failure_429_count,
       updated_at=now()
-    """, data)
+    where (t.proxy_uri, t.volume, t.success_200_count, t.failure_401_count, t.failure_400_count,
+           t.failure_500_count, t.failure_503_count, t.failure_504_count, t.failure_429_count)
+      is distinct from
+          (excluded.proxy_uri, excluded.volume, excluded.success_200_count, excluded.failure_401_count,
+           excluded.failure_400_count, excluded.failure_500_count, excluded.failure_503_count,
+           excluded.failure_504_count, excluded.failure_429_count)
+    """, bulk=bulk, conflict_target={
+        # the unique key is on generated, null-free copies of these columns (0009)
+        "proxy_name": ("proxy_key", "coalesce({}, '')"),
+        "central_id": ("central_key", "coalesce({}, '')"),
+    })
+    cur.close()
+    return counts
+
+
+# enterprise_api_volume_metrics is range-partitioned by month on start_date (0009); one
+# partition per month, named enterprise_api_volume_metrics_YYYY_MM.
+_VOLUME_PARTITION_PREFIX = "enterprise_api_volume_metrics_"
+_VOLUME_PARTITION_RE = re.compile(rf"{_VOLUME_PARTITION_PREFIX}(\d{{4}})_(\d{{2}})")
+_VOLUME_PARTITIONS: set[str] | None = None  # months (YYYY-MM) with a committed partition; read from pg_inherits once per run
+_PENDING_PARTITIONS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()  # conn -> months created, not yet committed
+
+
+def _existing_volume_partitions(cur) -> dict[str, str]:
+    """{YYYY-MM: partition name} for the monthly partitions currently attached."""
+    cur.execute("""
+    select c.relname
+    from pg_inherits i
+    join pg_class c on c.oid = i.inhrelid
+    join pg_class p on p.oid = i.inhparent
+    where p.relname = 'enterprise_api_volume_metrics'
+    """)
+    out = {}
+    for (name,) in cur.fetchall():
+        match = _VOLUME_PARTITION_RE.fullmatch(name)
+        if match:
+            out[f"{match.group(1)}-{match.group(2)}"] = name
+    return out
+
+
+def ensure_volume_metric_partitions(cur, start_dates) -> None:
+    """
+    Creates the monthly partitions the given start dates fall into. Existing partitions are
+    read from pg_inherits on the first call of the run, so DDL is only issued for missing months.
+    A created month is only remembered once its transaction commits; after a rollback the
+    next call creates it again.
+    """
+    global _VOLUME_PARTITIONS
+    if _VOLUME_PARTITIONS is None:
+        _VOLUME_PARTITIONS = set(_existing_volume_partitions(cur))
+    conn = cur.connection
+    pending = _PENDING_PARTITIONS.get(conn)
+    if pending is None:
+        pending = _PENDING_PARTITIONS[conn] = set()
+        _on_transaction_end(conn,
+                            lambda: _VOLUME_PARTITIONS.update(_PENDING_PARTITIONS.pop(conn, ())),
+                            lambda: _PENDING_PARTITIONS.pop(conn, None))
+    for month in sorted({str(d)[:7] for d in start_dates if d} - _VOLUME_PARTITIONS - pending):
+        y, m = int(month[:4]), int(month[5:7])
+        nxt = f"{y + m // 12:04d}-{m % 12 + 1:02d}-01"
+        cur.execute(
+            f"create table if not exists {_VOLUME_PARTITION_PREFIX}{y:04d}_{m:02d} "
+            f"partition of enterprise_api_volume_metrics for values from ('{month}-01') to ('{nxt}')"
+        )
+        pending.add(month)
+
+
+def drop_volume_metric_partitions_before(conn, month: str) -> list[str]:
+    """Retention: drops whole monthly partitions older than `month` (YYYY-MM-01). Returns their names."""
+    cur = conn.cursor()
+    existing = _existing_volume_partitions(cur)
+    dropped = sorted(name for m, name in existing.items() if m < month[:7])
+    for name in dropped:
+        cur.execute(f"drop table {name}")
+        if _VOLUME_PARTITIONS is not None:
+            _VOLUME_PARTITIONS.discard(f"{name[-7:-3]}-{name[-2:]}")
+    cur.close()
+    return dropped
+
+
+def check_volume_metric_writes(conn) -> None:
+    """
+    Writes a sentinel row to the partitioned enterprise_api_volume_metrics through both upsert
+    paths (paged VALUES and COPY) and checks the reported counts, inside a savepoint that is
+    rolled back. Raises RuntimeError when a path fails or miscounts.
+    """
+    row = {"gateway_name": "__write_check__", "proxy_name": None, "central_id": None,
+           "start_date": "1970-01-01", "end_date": "1970-01-31", "volume": 1}
+    cur = conn.cursor()
+    pending_before = set(_PENDING_PARTITIONS.get(conn, ()))
+    cur.execute("savepoint volume_write_check")
+    try:
+        for bulk in (False, True):
+            first = upsert_enterprise_api_volume_metrics(conn, [row], bulk=bulk)
+            again = upsert_enterprise_api_volume_metrics(conn, [row], bulk=bulk)
+            expected = ({"inserted": 0 if bulk else 1, "updated": 1 if bulk else 0, "unchanged": 0},
+                        {"inserted": 0, "updated": 0, "unchanged": 1})
+            if (first, again) != expected:
+                raise RuntimeError(f"[db] volume metric upsert (bulk={bulk}) reported {first}, {again}; "
+                                   f"expected {expected[0]}, {expected[1]}")
+            row = {**row, "volume": row["volume"] + 1}
+    finally:
+        cur.execute("rollback to savepoint volume_write_check")
+        # the sentinel month's partition went with the savepoint
+        pending = _PENDING_PARTITIONS.get(conn)
+        if pending is not None:
+            pending.intersection_update(pending_before)
+        cur.close()
+
+
+# ================== Incremental metrics watermark ==================
+
+def get_finalized_metric_months(conn, gateway_name: str) -> set[str]:
+    """Months (YYYY-MM-01) whose volume metrics are final and need no re-aggregation."""
+    cur = conn.cursor()
+    cur.execute("select month from enterprise_api_metrics_watermark where gateway_name = %s", (gateway_name,))
+    months = {m.strftime("%Y-%m-%d") if hasattr(m, "strftime") else str(m) for (m,) in cur.fetchall()}
+    cur.close()
+    return months
+
+
+def mark_metric_months_finalized(conn, gateway_name: str, months: list[str]):
+    if not months:
+        return
+    cur = conn.cursor()
+    cur.executemany("""
+    insert into enterprise_api_metrics_watermark (gateway_name, month)
+    values (%s, %s)
+    on conflict (gateway_name, month) do nothing
+    """, [(gateway_name, m) for m in months])
+    cur.close()
+
+
+# ================== Daily TPS rollup ==================
+
+def get_tps_rollup_days(conn, gateway_name: str, since: str) -> set[str]:
+    """Days (YYYY-MM-DD) on or after `since` that already have a stored TPS rollup."""
+    cur = conn.cursor()
+    cur.execute("select day from apigee_tps_daily where gateway_name = %s and day >= %s", (gateway_name, since))
+    days = {d.strftime("%Y-%m-%d") if hasattr(d, "strftime") else str(d) for (d,) in cur.fetchall()}
+    cur.close()
+    return days
+
+
+def upsert_apigee_tps_daily(conn, gateway_name: str, rows: dict[str, dict]):
+    """rows: {"YYYY-MM-DD": {peak_tps, rps_sum, active_seconds}}"""
+    if not rows:
+        return
+    cur = conn.cursor()
+    data = [
+        (gateway_name, day, r.get("peak_tps") or 0, r.get("rps_sum") or 0, r.get("active_seconds") or 0)
+        for day, r in rows.items()
+    ]
+    _execute_paged(cur, """
+    insert into apigee_tps_daily (gateway_name, day, peak_tps, rps_sum, active_seconds)""", """
+    on conflict (gateway_name, day) do update set
+      peak_tps=excluded.peak_tps,
+      rps_sum=excluded.rps_sum,
+      active_seconds=excluded.active_seconds,
+      updated_at=now()
+    """, data, 1000)
+    cur.close()
+
+
+def get_monthly_tps(conn, gateway_name: str, since: str) -> dict[str, dict]:
+    """
+    Monthly peak_tps / avg_tps from the daily rollups. avg_tps is averaged over the seconds
+    that saw traffic, as the per-second Splunk search computes it.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+    select to_char(date_trunc('month', day), 'YYYY-MM-DD') as month,
+           max(peak_tps) as peak_tps,
+           sum(rps_sum)::float8 / sum(active_seconds) as avg_tps
+    from apigee_tps_daily
+    where gateway_name = %s and day >= %s and active_seconds > 0
+    group by 1
+    order by 1
+    """, (gateway_name, since))
+    out = {m: {"peak_tps": peak, "avg_tps": avg} for m, peak, avg in cur.fetchall()}
+    cur.close()
+    return out
+
+
+# ================== First-seen registries ==================
+
+# registry -> (table, key column)
+_FIRST_SEEN_TABLES = {
+    "proxy": ("proxy_first_seen", "apiproxy"),
+    "consumer": ("consumer_first_seen", "consumer"),
+}
+
+
+def get_first_seen_synced_through(conn, gateway_name: str):
+    """End of the last Splunk window folded into the first-seen registries, or None before the first sync."""
+    cur = conn.cursor()
+    cur.execute("select synced_through from first_seen_sync where gateway_name = %s", (gateway_name,))
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else None
+
+
+def upsert_first_seen(conn, gateway_name: str, deltas: dict[str, dict], synced_through):
+    """
+    Folds {"proxy": {name: ts}, "consumer": {name: ts}} into the registries, keeping the
+    earliest timestamp per key, and advances the sync watermark in the same transaction.
+    """
+    cur = conn.cursor()
+    for registry, seen in deltas.items():
+        table, col = _FIRST_SEEN_TABLES[registry]
+        _execute_paged(cur, f"""
+        insert into {table} (gateway_name, {col}, first_seen)""", f"""
+        on conflict (gateway_name, {col}) do update set
+          first_seen=excluded.first_seen,
+          updated_at=now()
+        where excluded.first_seen < {table}.first_seen
+        """, [(gateway_name, k, ts) for k, ts in seen.items()], 1000)
+    cur.execute("""
+    insert into first_seen_sync (gateway_name, synced_through) values (%s, %s)
+    on conflict (gateway_name) do update set
+      synced_through=greatest(first_seen_sync.synced_through, excluded.synced_through),
+      updated_at=now()
+    """, (gateway_name, synced_through))
+    cur.close()
+
+
+def get_monthly_first_seen_counts(conn, gateway_name: str, registry: str, since: str, tz: str) -> dict[str, int]:
+    """Number of keys first seen per month ("YYYY-MM-01" in `tz`) from `since` on."""
+    table, _ = _FIRST_SEEN_TABLES[registry]
+    cur = conn.cursor()
+    cur.execute(f"""
+    select to_char(date_trunc('month', first_seen at time zone %s), 'YYYY-MM-DD') as month, count(*)
+    from {table}
+    where gateway_name = %s and (first_seen at time zone %s)::date >= %s
+    group by 1
+    """, (tz, gateway_name, tz, since))
+    out = {m: n for m, n in cur.fetchall()}
+    cur.close()
+    return out
+
+
+# ================== Distinct-consumer sketches ==================
+
+def get_consumer_sketch_days(conn, gateway_name: str, since: str) -> set[str]:
+    """Days (YYYY-MM-DD) on or after `since` with a stored all-proxies sketch."""
+    cur = conn.cursor()
+    cur.execute(
+        "select day from consumer_sketches where gateway_name = %s and apiproxy = '' and day >= %s",
+        (gateway_name, since),
+    )
+    days = {d.strftime("%Y-%m-%d") if hasattr(d, "strftime") else str(d) for (d,) in cur.fetchall()}
+    cur.close()
+    return days
+
+
+def upsert_consumer_sketches(conn, gateway_name: str, rows: list[tuple]):
+    """rows: (day, apiproxy or '', serialized sketch)"""
+    if not rows:
+        return
+    cur = conn.cursor()
+    _execute_paged(cur, """
+    insert into consumer_sketches (gateway_name, day, apiproxy, sketch)""", """
+    on conflict (gateway_name, day, apiproxy) do update set
+      sketch=excluded.sketch,
+      updated_at=now()
+    """, [(gateway_name, day, proxy, sketch) for day, proxy, sketch in rows], 500)
+    cur.close()
+
+
+def get_consumer_sketches(conn, gateway_name: str, start: str, end: str, apiproxy: str = "") -> list[bytes]:
+    """Serialized sketches for the days in [start, end) of one proxy ('' = all proxies)."""
+    cur = conn.cursor()
+    cur.execute("""
+    select sketch from consumer_sketches
+    where gateway_name = %s and apiproxy = %s and day >= %s and day < %s
+    """, (gateway_name, apiproxy, start, end))
+    out = [bytes(s) for (s,) in cur.fetchall()]
+    cur.close()
+    return out
+
+
+# ================== Catalog harvest state ==================
+
+def get_catalog_harvest_state(conn, org_name: str, env_name: str) -> dict[str, dict]:
+    """
+    {proxy_name: {revision: catalog row}} as recorded by past catalog runs for this org/env,
+    each proxy's revisions ordered newest first: by harvest time, then by revision number,
+    since every row written by one run shares that run's transaction timestamp.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+    select proxy_name, revision, catalog_row from apigee_catalog_harvest_state
+    where org_name = %s and env_name = %s
+    order by harvested_at desc,
+             case when revision ~ '^[0-9]+$' then revision::numeric end desc nulls last,
+             revision desc
+    """, (org_name, env_name))
+    out = {}
+    for proxy, rev, row in cur.fetchall():
+        out.setdefault(proxy, {})[rev] = json.loads(row) if isinstance(row, str) else row
+    cur.close()
+    return out
+
+
+def upsert_catalog_harvest_state(conn, org_name: str, env_name: str, rows: list[tuple], keep: list[tuple] = None):
+    """
+    rows: (proxy_name, revision, catalog row dict) for freshly harvested revisions.
+    keep: when given, the (proxy_name, revision) pairs still in the catalog; state for any
+    other revision of this org/env is deleted.
+    """
+    cur = conn.cursor()
+    # one statement may not touch a key twice
+    data = {(proxy, str(rev)): row for proxy, rev, row in rows}
+    if data:
+        _execute_paged(cur, """
+        insert into apigee_catalog_harvest_state (org_name, env_name, proxy_name, revision, catalog_row)""", """
+        on conflict (org_name, env_name, proxy_name, revision) do update set
+          catalog_row=excluded.catalog_row,
+          harvested_at=now()
+        """, [(org_name, env_name, proxy, rev, json.dumps(row)) for (proxy, rev), row in data.items()], 500)
+    if keep is not None:
+        cur.execute("""
+        delete from apigee_catalog_harvest_state
+        where org_name = %s and env_name = %s
+          and not (proxy_name || chr(31) || revision = any(%s))
+        """, (org_name, env_name, [f"{proxy}\x1f{rev}" for proxy, rev in keep] or [""]))
     cur.close()
@@ -0,0 +1,56 @@
+# Versioned schema migrations: numbered resources/sql/NNNN_*.sql files, applied once each
+import hashlib
+import re
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "resources" / "sql"
+_MIGRATION_RE = re.compile(r"^(\d{4})_[\w.-]+\.sql$")
+# pg_advisory_xact_lock key so concurrent runners do not apply the same migration twice
+_LOCK_KEY = 0x41474752  # "AGGR"
+
+
+def _migration_files(directory: Path) -> list[tuple[str, Path]]:
+    out = []
+    for p in sorted(directory.iterdir()):
+        m = _MIGRATION_RE.match(p.name)
+        if m:
+            out.append((m.group(1), p))
+    return out
+
+
+def apply_migrations(conn, directory: Path = None) -> list[str]:
+    """
+    Applies every migration file not yet recorded in schema_migrations, in version order,
+    inside the caller's transaction. Returns the file names applied. Files already applied
+    but changed since are reported, not re-run: add a new numbered file instead.
+    """
+    directory = Path(directory or MIGRATIONS_DIR)
+    cur = conn.cursor()
+    cur.execute("select pg_advisory_xact_lock(%s)", (_LOCK_KEY,))
+    cur.execute("""
+    create table if not exists schema_migrations(
+      version text primary key,
+      name text not null,
+      checksum text not null,
+      applied_at timestamptz not null default now()
+    )""")
+    cur.execute("select version, checksum from schema_migrations")
+    applied = {v: c for v, c in cur.fetchall()}
+
+    done = []
+    for version, path in _migration_files(directory):
+        sql = path.read_text()
+        checksum = hashlib.sha256(sql.encode()).hexdigest()
+        if version in applied:
+            if applied[version] != checksum:
+                print(f"[db] migration {path.name} changed after it was applied; not re-running it")
+            continue
+        cur.execute(sql)  # no parameters: simple query protocol, so a file may hold several statements
+        cur.execute(
+            "insert into schema_migrations (version, name, checksum) values (%s, %s, %s)",
+            (version, path.name, checksum),
+        )
+        done.append(path.name)
+        print(f"[db] applied migration {path.name}")
+    cur.close()
+    return done
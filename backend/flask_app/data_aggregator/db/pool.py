@@ -0,0 +1,150 @@
+# Connection reuse for pg8000: a small per-database pool and per-connection prepared statements
+import atexit
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from pg8000 import dbapi as pg
+
+try:
+    from pg8000.converters import make_params
+except ImportError:  # very old pg8000: prepared statements are skipped
+    make_params = None
+
+from ..utils.env_utils import get_env_bool, get_env_int
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of pg8000 connections to one database.
+    - Released connections are kept (up to max_idle) and handed out again, so a process that
+      runs several jobs pays TLS/auth setup once.
+    - A connection idle for more than check_after seconds is pinged before reuse; one that
+      fails the ping is closed and replaced.
+    - Callers must release a connection with no open transaction, or discard it.
+    """
+
+    def __init__(self, params: dict, max_idle: int = 4, check_after: float = 30.0):
+        self.params = params
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._idle: list[tuple] = []  # (conn, released_at)
+        self._lock = threading.Lock()
+
+    def _healthy(self, conn) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute("select 1")
+            cur.fetchall()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self.check_after or self._healthy(conn):
+                return conn
+            _close_quietly(conn)
+        return pg.connect(**self.params)
+
+    def release(self, conn, discard: bool = False) -> None:
+        if not discard:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+        _close_quietly(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_POOLS: dict[tuple, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(params: dict) -> ConnectionPool:
+    """Process-wide pool for the database described by pg8000 connect params."""
+    key = (params["host"], params["port"], params["database"], params["user"])
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ConnectionPool(
+                params,
+                max_idle=get_env_int("AGG_PG_POOL_SIZE", 4, minimum=0),
+                check_after=get_env_int("AGG_PG_POOL_CHECK_SECONDS", 30, minimum=0),
+            )
+        return pool
+
+
+@atexit.register
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+# ---------------- prepared statements ----------------
+
+# connection -> OrderedDict(sql -> (server statement, name, columns, input funcs)), LRU-ordered
+_PREPARED: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_PREPARED_MAX = 64
+
+# pg8000 internals the prepared path relies on (tested with pg8000 1.31, pinned in requirements.txt);
+# if any is missing the statement goes through cursor.execute instead
+_CONN_INTERNALS = ("_in_transaction", "autocommit", "execute_simple", "prepare_statement",
+                   "close_prepared_statement", "execute_named", "py_types")
+
+
+def _supports_prepared(conn) -> bool:
+    return (make_params is not None and hasattr(pg, "convert_paramstyle") and hasattr(pg, "paramstyle")
+            and all(hasattr(conn, attr) for attr in _CONN_INTERNALS))
+
+
+def execute_prepared(cur, sql: str, args) -> list:
+    """
+    Runs a parameterised statement (format paramstyle) as a named prepared statement cached
+    on the cursor's connection, so repeated upsert pages skip parse/plan on the server.
+    Returns the result rows ([] when the statement returns none). Falls back to a plain
+    cursor.execute when disabled (AGG_PG_PREPARED=false) or when the pg8000 version lacks any
+    of the internals used here (_supports_prepared).
+    """
+    conn = cur.connection
+    if not get_env_bool("AGG_PG_PREPARED", True) or not _supports_prepared(conn):
+        cur.execute(sql, args)
+        return cur.fetchall() if cur.description else []
+
+    if not conn._in_transaction and not conn.autocommit:
+        conn.execute_simple("begin transaction")  # as cursor.execute does
+    statement, vals = pg.convert_paramstyle(pg.paramstyle, sql, args)
+    cache = _PREPARED.setdefault(conn, OrderedDict())
+    entry = cache.get(sql)
+    if entry is None:
+        entry = cache[sql] = (statement, *conn.prepare_statement(statement, ()))
+        if len(cache) > _PREPARED_MAX:
+            _, (_, old_name, _, _) = cache.popitem(last=False)
+            conn.close_prepared_statement(old_name)
+    else:
+        cache.move_to_end(sql)
+    statement, name, columns, input_funcs = entry
+    context = conn.execute_named(name, make_params(conn.py_types, vals), columns, input_funcs, statement)
+    return list(context.rows or []) if columns else []
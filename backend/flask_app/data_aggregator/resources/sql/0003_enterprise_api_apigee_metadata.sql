@@ -0,0 +1,19 @@
+create table if not exists enterprise_api_apigee_metadata (
+  id                  bigserial primary key,
+  org_name            text not null,
+  env_name            text not null,
+  central_id          text,
+  proxy_name          text not null,
+  proxy_base_path     text,
+  proxy_resource_path text,
+  security_mechanism  text,
+  backend_target_path text,
+  rate_limit          text,
+  io_timeout          int,
+  connect_timeout     int,
+  developer_name      text,
+  developer_app_name  text,
+  created_at          timestamptz not null default now(),
+  updated_at          timestamptz not null default now(),
+  unique (org_name, env_name, proxy_name)
+);
@@ -0,0 +1,20 @@
+create table if not exists enterprise_api_volume_metrics (
+  id                  bigserial primary key,
+  gateway_name        text not null,
+  proxy_name          text,
+  central_id          text,
+  proxy_uri           text,
+  start_date          date not null,
+  end_date            date not null,
+  volume              bigint,
+  success_200_count   bigint,
+  failure_401_count   bigint,
+  failure_400_count   bigint,
+  failure_500_count   bigint,
+  failure_503_count   bigint,
+  failure_504_count   bigint,
+  failure_429_count   bigint,
+  created_at          timestamptz not null default now(),
+  updated_at          timestamptz not null default now(),
+  unique (gateway_name, proxy_name, central_id, start_date, end_date)
+);
@@ -0,0 +1,6 @@
+create table if not exists enterprise_api_metrics_watermark (
+  gateway_name        text not null,
+  month               date not null,
+  finalized_at        timestamptz not null default now(),
+  primary key (gateway_name, month)
+);
@@ -0,0 +1,9 @@
+create table if not exists apigee_tps_daily (
+  gateway_name        text not null,
+  day                 date not null,
+  peak_tps            int not null,
+  rps_sum             bigint not null,
+  active_seconds      int not null,
+  updated_at          timestamptz not null default now(),
+  primary key (gateway_name, day)
+);
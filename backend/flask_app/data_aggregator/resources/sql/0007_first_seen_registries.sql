@@ -0,0 +1,19 @@
+create table if not exists proxy_first_seen (
+  gateway_name        text not null,
+  apiproxy            text not null,
+  first_seen          timestamptz not null,
+  updated_at          timestamptz not null default now(),
+  primary key (gateway_name, apiproxy)
+);
+create table if not exists consumer_first_seen (
+  gateway_name        text not null,
+  consumer            text not null,
+  first_seen          timestamptz not null,
+  updated_at          timestamptz not null default now(),
+  primary key (gateway_name, consumer)
+);
+create table if not exists first_seen_sync (
+  gateway_name        text primary key,
+  synced_through      timestamptz not null,
+  updated_at          timestamptz not null default now()
+);
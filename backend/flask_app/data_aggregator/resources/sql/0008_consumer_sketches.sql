@@ -0,0 +1,8 @@
+create table if not exists consumer_sketches (
+  gateway_name        text not null,
+  day                 date not null,
+  apiproxy            text not null default '',
+  sketch              bytea not null,
+  updated_at          timestamptz not null default now(),
+  primary key (gateway_name, day, apiproxy)
+);
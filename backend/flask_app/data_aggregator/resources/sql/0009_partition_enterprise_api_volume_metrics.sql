@@ -0,0 +1,60 @@
+-- Rebuild enterprise_api_volume_metrics as a table range-partitioned by month on start_date.
+-- NULL proxy_name/central_id never conflict in the old unique key, so every run appended
+-- another copy of the platform-wide rows. The new key uses generated, non-null columns.
+
+alter table enterprise_api_volume_metrics rename to enterprise_api_volume_metrics_unpartitioned;
+alter index enterprise_api_volume_metrics_pkey rename to enterprise_api_volume_metrics_unpartitioned_pkey;
+alter sequence enterprise_api_volume_metrics_id_seq rename to enterprise_api_volume_metrics_unpartitioned_id_seq;
+
+create table enterprise_api_volume_metrics (
+  id                  bigserial,
+  gateway_name        text not null,
+  proxy_name          text,
+  central_id          text,
+  proxy_key           text generated always as (coalesce(proxy_name, '')) stored,
+  central_key         text generated always as (coalesce(central_id, '')) stored,
+  proxy_uri           text,
+  start_date          date not null,
+  end_date            date not null,
+  volume              bigint,
+  success_200_count   bigint,
+  failure_401_count   bigint,
+  failure_400_count   bigint,
+  failure_500_count   bigint,
+  failure_503_count   bigint,
+  failure_504_count   bigint,
+  failure_429_count   bigint,
+  created_at          timestamptz not null default now(),
+  updated_at          timestamptz not null default now(),
+  primary key (id, start_date),
+  constraint enterprise_api_volume_metrics_key
+    unique (gateway_name, proxy_key, central_key, start_date, end_date)
+) partition by range (start_date);
+
+create index enterprise_api_volume_metrics_proxy_start on enterprise_api_volume_metrics (proxy_name, start_date);
+create index enterprise_api_volume_metrics_gateway_start on enterprise_api_volume_metrics (gateway_name, start_date);
+
+do $$
+declare m date;
+begin
+  for m in select distinct date_trunc('month', start_date)::date from enterprise_api_volume_metrics_unpartitioned loop
+    execute format(
+      'create table if not exists %I partition of enterprise_api_volume_metrics for values from (%L) to (%L)',
+      'enterprise_api_volume_metrics_' || to_char(m, 'YYYY_MM'), m, (m + interval '1 month')::date);
+  end loop;
+end $$;
+
+-- keep the most recently written copy of each duplicated row
+insert into enterprise_api_volume_metrics (
+  gateway_name, proxy_name, central_id, proxy_uri, start_date, end_date,
+  volume, success_200_count, failure_401_count, failure_400_count, failure_500_count,
+  failure_503_count, failure_504_count, failure_429_count, created_at, updated_at
+)
+select distinct on (gateway_name, coalesce(proxy_name, ''), coalesce(central_id, ''), start_date, end_date)
+  gateway_name, proxy_name, central_id, proxy_uri, start_date, end_date,
+  volume, success_200_count, failure_401_count, failure_400_count, failure_500_count,
+  failure_503_count, failure_504_count, failure_429_count, created_at, updated_at
+from enterprise_api_volume_metrics_unpartitioned
+order by gateway_name, coalesce(proxy_name, ''), coalesce(central_id, ''), start_date, end_date, updated_at desc, id desc;
+
+drop table enterprise_api_volume_metrics_unpartitioned;
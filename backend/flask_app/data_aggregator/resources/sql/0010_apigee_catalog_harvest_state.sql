@@ -0,0 +1,10 @@
+-- One state row per deployed revision: a proxy can have several revisions deployed in one env.
+create table if not exists apigee_catalog_harvest_state (
+  org_name            text not null,
+  env_name            text not null,
+  proxy_name          text not null,
+  revision            text not null,
+  catalog_row         jsonb not null,
+  harvested_at        timestamptz not null default now(),
+  primary key (org_name, env_name, proxy_name, revision)
+);
@@ -1,6 +1,12 @@
 from .config import load_settings
-from .db import get_conn, upsert_enterprise_api_apigee_metadata
+from .db import (
+    get_conn,
+    upsert_enterprise_api_apigee_metadata,
+    get_catalog_harvest_state,
+    upsert_catalog_harvest_state,
+)
 from .apigee_loaders import load_apigee_catalog
+from .utils.env_utils import get_env_bool
 
 
 def _map_to_enterprise_metadata(rows: list[dict], org: str, env: str) -> list[dict]:
@@ -24,13 +30,31 @@ def _map_to_enterprise_metadata(rows: list[dict], org: str, env: str) -> list[di
     return out
 
 
-def main():
+def main(full: bool = False):
+    """
+    Harvests the catalog for the configured org/env. Proxies still deployed at the revision
+    recorded by the last run are carried forward without Apigee calls; `full` (or
+    AGG_CATALOG_SKIP_UNCHANGED=false) re-harvests every deployed revision.
+    """
     s = load_settings()
-    rows = load_apigee_catalog(s.apigee_planet, s.apigee_org, s.apigee_env)
+    previous = {}
+    if not full and get_env_bool("AGG_CATALOG_SKIP_UNCHANGED", True):
+        with get_conn(s.pg_url) as conn:
+            previous = get_catalog_harvest_state(conn, s.apigee_org, s.apigee_env)
+    rows = load_apigee_catalog(s.apigee_planet, s.apigee_org, s.apigee_env, previous=previous)
     mapped = _map_to_enterprise_metadata(rows, s.apigee_org, s.apigee_env)
+    # record only revisions harvested this run; carried rows already match their state
+    harvested = [
+        (r["apiproxy"], r["revision"], r) for r in rows
+        if r.get("revision") is not None and r["revision"] not in previous.get(r["apiproxy"], {})
+    ]
+    in_catalog = [(r["apiproxy"], r["revision"]) for r in rows if r.get("revision") is not None]
     with get_conn(s.pg_url) as conn:
-        upsert_enterprise_api_apigee_metadata(conn, mapped)
-    print(f"[catalog] upserted {len(mapped)} rows into enterprise_api_apigee_metadata")
+        counts = upsert_enterprise_api_apigee_metadata(conn, mapped, bulk=get_env_bool("AGG_PG_BULK", True))
+        # prune state for undeployed revisions only after a harvest that returned a catalog
+        upsert_catalog_harvest_state(conn, s.apigee_org, s.apigee_env, harvested, keep=in_catalog or None)
+    print(f"[catalog] enterprise_api_apigee_metadata: {counts['inserted']} inserted, "
+          f"{counts['updated']} updated, {counts['unchanged']} unchanged")
     return len(mapped)
 
 
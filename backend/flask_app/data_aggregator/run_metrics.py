@@ -1,7 +1,30 @@
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterable, Iterator
+from zoneinfo import ZoneInfo
+
 from .config import load_settings
-from .db import get_conn, upsert_enterprise_api_volume_metrics
-from .apigee_loaders import fetch_apigee_monthlies
+from .db import (
+    get_conn, upsert_apigee_metrics, upsert_enterprise_api_volume_metrics, drop_volume_metric_partitions_before,
+    get_finalized_metric_months, mark_metric_months_finalized,
+    get_tps_rollup_days, upsert_apigee_tps_daily, get_monthly_tps,
+    get_first_seen_synced_through, upsert_first_seen, get_monthly_first_seen_counts,
+    get_consumer_sketch_days, upsert_consumer_sketches, get_consumer_sketches,
+)
+from .apigee_loaders import (
+    fetch_apigee_monthlies, fetch_apigee_monthlies_sharded, fetch_apigee_daily_tps, fetch_apigee_daily_consumers,
+    fetch_first_seen_delta,
+    iter_apigee_proxy_monthlies,
+    FULL_HISTORY_EARLIEST, STATUS_COUNT_FIELDS,
+)
 from .utils.apigee_constants import SPLUNK_API_BY_ENV  # mapping per env
+from .utils.env_utils import get_env_bool, get_env_float, get_env_int
+from .utils.hll import HyperLogLog, precision_for_error
+
+GATEWAY_NAME = "Apigee"
+HISTORY_MONTHS = 12  # complete months covered by FULL_HISTORY_EARLIEST (-13mon)
 
 
 def _resolve_splunk_host(splunk_host: str, env_key: str) -> str:
@@ -37,32 +60,256 @@ def _map_monthlies_to_enterprise(rows: list[dict], gateway_name: str, env_key: s
         end_date = (date(end_y, end_m, 1) - timedelta(days=1)).strftime("%Y-%m-%d")
         out.append({
             "gateway_name": gateway_name,
-            "proxy_name": None,  # unknown at monthly aggregate level
+            "proxy_name": r.get("apiproxy"),  # None for the platform-wide aggregate
             "central_id": None,
             "proxy_uri": None,
             "start_date": start_date,
             "end_date": end_date,
             "volume": r.get("requests"),
-            "success_200_count": r.get("success_200_count") or None,
-            "failure_401_count": r.get("failure_401_count") or None,
-            "failure_400_count": r.get("failure_400_count") or None,
-            "failure_500_count": r.get("failure_500_count") or None,
-            "failure_503_count": r.get("failure_503_count") or None,
-            "failure_504_count": r.get("failure_504_count") or None,
-            "failure_429_count": r.get("failure_429_count") or None,
+            **{k: r.get(k) for k in STATUS_COUNT_FIELDS},
         })
     return out
 
 
-def main():
+def _fmt_counts(counts: dict[str, int]) -> str:
+    return f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged"
+
+
+def _batched(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _add_months(d: date, months: int) -> date:
+    y, m = divmod(d.month - 1 + months, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _months_between(older: date, newer: date) -> int:
+    return (newer.year - older.year) * 12 + (newer.month - older.month)
+
+
+def _plan_incremental(open_month: date, grace: int, finalized: set[str]) -> date:
+    """
+    Oldest month an incremental run must re-aggregate: the grace window start, or an
+    older month inside the history that was never finalized (first run, missed nights).
+    """
+    window_start = _add_months(open_month, -grace)
+    oldest = window_start
+    for i in range(grace + 1, HISTORY_MONTHS + 1):
+        m = _add_months(open_month, -i)
+        if m.strftime("%Y-%m-%d") not in finalized:
+            oldest = m
+    return oldest
+
+
+def main(full: bool = False, per_proxy: bool = False):
     s = load_settings()
+    per_proxy = per_proxy or get_env_bool("AGG_METRICS_PER_PROXY", False)
     host = _resolve_splunk_host(s.splunk_host, s.apigee_env)
-    rows = fetch_apigee_monthlies(host, s.splunk_user, s.splunk_password, s.splunk_verify_tls)
-    mapped = _map_monthlies_to_enterprise(rows, gateway_name="Apigee", env_key=s.apigee_env)
+    full = full or os.getenv("AGG_METRICS_MODE", "incremental").strip().lower() == "full"
+    grace = get_env_int("AGG_METRICS_GRACE_MONTHS", 1, minimum=0)
+    open_month = datetime.now(ZoneInfo(s.tz)).date().replace(day=1)
+    window_start = _add_months(open_month, -grace)
+
+    if full:
+        oldest = None
+        earliest = FULL_HISTORY_EARLIEST
+    else:
+        with get_conn(s.pg_url) as conn:
+            finalized = get_finalized_metric_months(conn, GATEWAY_NAME)
+        oldest = _plan_incremental(open_month, grace, finalized)
+        back = _months_between(oldest, open_month)
+        earliest = f"-{back}mon@mon" if back else "@mon"
+    print(f"[metrics] mode={'full' if full else 'incremental'} earliest={earliest} grace={grace} open={open_month}")
+
+    # peak/avg TPS come from the stored daily rollups unless AGG_TPS_ROLLUP=false, and
+    # onboarded/new-consumer counts from the first-seen registries unless AGG_FIRST_SEEN_REGISTRY=false
+    use_rollup = get_env_bool("AGG_TPS_ROLLUP", True)
+    use_registry = get_env_bool("AGG_FIRST_SEEN_REGISTRY", True) and _sync_first_seen(s, host, full)
+    skip = [name for name, on in (("tps", use_rollup), ("first_seen", use_registry)) if on]
+    shard_span = os.getenv("APIGEE_METRICS_SHARD_SPAN", "").strip().lower()
+    if shard_span:
+        # time-sliced parallel jobs over whole months: [oldest, next month) with first-seen over the full history
+        history_start = _add_months(open_month, -HISTORY_MONTHS)
+        print(f"[metrics] sharding searches by '{shard_span}' from {oldest or history_start}")
+        rows = fetch_apigee_monthlies_sharded(
+            host, s.splunk_user, s.splunk_password, s.splunk_verify_tls,
+            start=oldest or history_start, end=_add_months(open_month, 1), span=shard_span, tz=s.tz,
+            history_start=history_start, skip=skip,
+        )
+    else:
+        rows = fetch_apigee_monthlies(host, s.splunk_user, s.splunk_password, s.splunk_verify_tls,
+                                      earliest=earliest, skip=skip)
+    if oldest is not None:
+        rows = [r for r in rows if r.get("month") and r["month"] >= oldest.strftime("%Y-%m-%d")]
+    unrolled: set[str] = set()
+    if use_rollup and rows:
+        tps, unrolled = _refresh_tps_rollup(s, host, start=oldest or _add_months(open_month, -HISTORY_MONTHS), full=full)
+        for r in rows:
+            r.update(tps.get(r["month"], {}))
+    if use_registry and rows:
+        since = (oldest or _add_months(open_month, -HISTORY_MONTHS)).strftime("%Y-%m-%d")
+        with get_conn(s.pg_url) as conn:
+            onboarded = get_monthly_first_seen_counts(conn, GATEWAY_NAME, "proxy", since, s.tz)
+            new_consumers = get_monthly_first_seen_counts(conn, GATEWAY_NAME, "consumer", since, s.tz)
+        for r in rows:
+            r["onboarded_apis"] = onboarded.get(r["month"], 0)
+            r["new_consumers"] = new_consumers.get(r["month"], 0)
+    mapped = _map_monthlies_to_enterprise(rows, gateway_name=GATEWAY_NAME, env_key=s.apigee_env)
+
+    # Months older than the grace window are final once written. The oldest month of a
+    # full -13mon scan starts mid-month, so it is never finalized, and neither is a month
+    # with a failed TPS rollup day, so the next incremental run searches it again.
+    history_start = _add_months(open_month, -HISTORY_MONTHS).strftime("%Y-%m-%d")
+    closed = sorted({
+        r["start_date"] for r in mapped
+        if history_start <= r["start_date"] < window_start.strftime("%Y-%m-%d") and r["start_date"] not in unrolled
+    })
+    with get_conn(s.pg_url) as conn:
+        upsert_apigee_metrics(conn, rows)
+        counts = upsert_enterprise_api_volume_metrics(conn, mapped)
+        mark_metric_months_finalized(conn, GATEWAY_NAME, closed)
+        retention = get_env_int("AGG_METRICS_RETENTION_MONTHS", 0, minimum=0)
+        if retention:
+            dropped = drop_volume_metric_partitions_before(conn, _add_months(open_month, -retention).strftime("%Y-%m-%d"))
+            if dropped:
+                print(f"[metrics] retention dropped partitions: {dropped}")
+    print(f"[metrics] enterprise_api_volume_metrics (host: {host}): {_fmt_counts(counts)}; "
+          f"finalized months: {closed or 'none'}")
+    total = len(mapped)
+    if get_env_bool("AGG_CONSUMER_SKETCHES", False):
+        _refresh_consumer_sketches(s, host, start=oldest or _add_months(open_month, -HISTORY_MONTHS),
+                                   full=full, per_proxy=per_proxy)
+        today = datetime.now(ZoneInfo(s.tz)).date()
+        with get_conn(s.pg_url) as conn:
+            rolling = count_distinct_consumers(conn, today - timedelta(days=29), today + timedelta(days=1))
+        print(f"[metrics] active consumers over the last 30 days: ~{rolling}")
+    if per_proxy:
+        total += _load_per_proxy(s, host, earliest, oldest)
+    return total
+
+
+def _sync_first_seen(s, host: str, full: bool) -> bool:
+    """
+    Folds the Splunk events since the last sync (less AGG_FIRST_SEEN_OVERLAP_HOURS for late
+    events) into the proxy/consumer first-seen registries. The first sync and full runs scan
+    FULL_HISTORY_EARLIEST; entries older than that are kept. Returns False when the delta
+    search failed, in which case the caller falls back to the full-history Splunk searches.
+    """
+    overlap = get_env_int("AGG_FIRST_SEEN_OVERLAP_HOURS", 24, minimum=0)
+    latest = int(time.time())
+    with get_conn(s.pg_url) as conn:
+        synced = get_first_seen_synced_through(conn, GATEWAY_NAME)
+    earliest = FULL_HISTORY_EARLIEST if full or synced is None else int(synced.timestamp()) - overlap * 3600
+    deltas = fetch_first_seen_delta(host, s.splunk_user, s.splunk_password, s.splunk_verify_tls, earliest, latest)
+    if deltas is None:
+        print("[metrics] first-seen registry sync failed; using full-history searches this run")
+        return False
+    with get_conn(s.pg_url) as conn:
+        upsert_first_seen(conn, GATEWAY_NAME, deltas, datetime.fromtimestamp(latest, tz=timezone.utc))
+    print(f"[metrics] first-seen registries synced from {earliest}: "
+          f"{len(deltas['proxy'])} proxies, {len(deltas['consumer'])} consumers in window")
+    return True
+
+
+def _days_to_search(start: date, today: date, have: set[str], refresh_days: int) -> list[date]:
+    """Days in [start, today] that are not stored yet or fall within the last refresh_days."""
+    days = []
+    d = start
+    while d <= today:
+        if (today - d).days <= refresh_days or d.strftime("%Y-%m-%d") not in have:
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def _refresh_tps_rollup(s, host: str, start: date, full: bool) -> tuple[dict[str, dict], set[str]]:
+    """
+    Brings apigee_tps_daily up to date from `start` through today and returns monthly
+    {peak_tps, avg_tps} computed from it, plus the months ("YYYY-MM-01") with a day whose
+    search failed; those must not be finalized. Only days without a rollup are searched, plus
+    the last AGG_TPS_REFRESH_DAYS days (today is still open and late events may land); a
+    full run re-searches every day.
+    """
+    refresh_days = get_env_int("AGG_TPS_REFRESH_DAYS", 1, minimum=0)
+    today = datetime.now(ZoneInfo(s.tz)).date()
+    since = start.strftime("%Y-%m-%d")
+    with get_conn(s.pg_url) as conn:
+        have = set() if full else get_tps_rollup_days(conn, GATEWAY_NAME, since)
+    days = _days_to_search(start, today, have, refresh_days)
+    fetched = fetch_apigee_daily_tps(host, s.splunk_user, s.splunk_password, s.splunk_verify_tls, days, tz=s.tz)
+    failed = [d.strftime("%Y-%m-%d") for d in days if d.strftime("%Y-%m-%d") not in fetched]
+    unrolled = {day[:8] + "01" for day in failed}
+    if failed:
+        print(f"[metrics] {len(failed)} TPS rollup day(s) failed; not finalizing {', '.join(sorted(unrolled))} "
+              f"so they are retried next run")
+    with get_conn(s.pg_url) as conn:
+        upsert_apigee_tps_daily(conn, GATEWAY_NAME, fetched)
+        return get_monthly_tps(conn, GATEWAY_NAME, since), unrolled
+
+
+def _refresh_consumer_sketches(s, host: str, start: date, full: bool, per_proxy: bool) -> None:
+    """
+    Stores one HyperLogLog sketch of the distinct consumers per day (and per proxy with
+    per_proxy) from `start` through today, searching only missing and recent days as the
+    TPS rollup does. AGG_SKETCH_ERROR sets the relative standard error of new sketches.
+    """
+    precision = precision_for_error(get_env_float("AGG_SKETCH_ERROR", 0.02))
+    today = datetime.now(ZoneInfo(s.tz)).date()
+    with get_conn(s.pg_url) as conn:
+        have = set() if full else get_consumer_sketch_days(conn, GATEWAY_NAME, start.strftime("%Y-%m-%d"))
+    days = _days_to_search(start, today, have, get_env_int("AGG_TPS_REFRESH_DAYS", 1, minimum=0))
+    fetched = fetch_apigee_daily_consumers(host, s.splunk_user, s.splunk_password, s.splunk_verify_tls,
+                                           days, tz=s.tz, per_proxy=per_proxy)
+    rows = [
+        (day, proxy, HyperLogLog(precision).update(consumers).to_bytes())
+        for day, groups in fetched.items()
+        for proxy, consumers in groups.items()
+    ]
+    with get_conn(s.pg_url) as conn:
+        upsert_consumer_sketches(conn, GATEWAY_NAME, rows)
+    print(f"[metrics] stored {len(rows)} consumer sketches for {len(fetched)} day(s) (precision {precision})")
+
+
+def count_distinct_consumers(conn, start: date, end: date, apiproxy: str = "") -> int | None:
+    """
+    Estimated distinct consumers over the days in [start, end) for one proxy ("" = all),
+    merged from the stored daily sketches; None when no sketch covers the window.
+    """
+    merged = None
+    for blob in get_consumer_sketches(conn, GATEWAY_NAME, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), apiproxy):
+        sketch = HyperLogLog.from_bytes(blob)
+        merged = sketch if merged is None else merged.merge(sketch)
+    return merged.count() if merged is not None else None
+
+
+def _load_per_proxy(s, host: str, earliest: str, oldest) -> int:
+    """
+    Streams per-proxy monthly rows from one Splunk search into the table in batches.
+    Raises RuntimeError when the search failed, so a failed run is not reported as 0 rows.
+    """
+    batch_rows = get_env_int("AGG_METRICS_BATCH_ROWS", 5000)
+    bulk = get_env_bool("AGG_PG_BULK", True)
+    floor = oldest.strftime("%Y-%m-%d") if oldest is not None else ""
+    status: dict[str, bool] = {}
+    rows = (
+        r for r in iter_apigee_proxy_monthlies(host, s.splunk_user, s.splunk_password, s.splunk_verify_tls,
+                                               earliest=earliest, status=status)
+        if r["month"] >= floor
+    )
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0}
     with get_conn(s.pg_url) as conn:
-        upsert_enterprise_api_volume_metrics(conn, mapped)
-    print(f"[metrics] upserted {len(mapped)} enterprise_api_volume_metrics rows (host: {host})")
-    return len(mapped)
+        for batch in _batched(rows, batch_rows):
+            counts = upsert_enterprise_api_volume_metrics(
+                conn, _map_monthlies_to_enterprise(batch, GATEWAY_NAME, s.apigee_env), bulk=bulk)
+            for k, n in counts.items():
+                totals[k] += n
+    if not status.get("ok"):
+        raise RuntimeError("[metrics] per-proxy Splunk search failed; no per-proxy rows written")
+    print(f"[metrics] per-proxy enterprise_api_volume_metrics: {_fmt_counts(totals)}")
+    return sum(totals.values())
 
 
 if __name__ == "__main__":
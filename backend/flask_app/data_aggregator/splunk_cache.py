@@ -0,0 +1,180 @@
+# backend/flask_app/data_aggregator/splunk_cache.py
+import calendar
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .utils.disk_cache import DiskCache
+from .utils.env_constants import LOCAL_CACHE_DIR
+from .utils.env_utils import get_env_bool, get_env_int
+
+# Query classes by resolved window length: (name, min window seconds, default ttl, time resolution).
+# The resolution is how finely "now" is bucketed when resolving relative bounds, so
+# e.g. a -13mon search issued at 02:00 and at 14:00 on the same day share one key.
+_QUERY_CLASSES: List[Tuple[str, int, int, int]] = [
+    ("history", 31 * 86400, 12 * 3600, 86400),
+    ("window",  86400,      3600,      3600),
+    ("recent",  0,          600,       60),
+]
+
+_TIME_TOKEN_RE = re.compile(r"\b(earliest|latest)\s*=\s*(\"[^\"]*\"|\S+)", re.IGNORECASE)
+_RELATIVE_RE = re.compile(r"^([+-]\d*)?(s|sec|secs|second|seconds|m|min|mins|minute|minutes|h|hr|hrs|hour|hours|"
+                          r"d|day|days|w|week|weeks|mon|month|months|q|qtr|quarter|quarters|y|yr|year|years)?"
+                          r"(?:@(\w+))?$", re.IGNORECASE)
+_UNIT_ALIASES = {
+    "s": "s", "sec": "s", "secs": "s", "second": "s", "seconds": "s",
+    "m": "m", "min": "m", "mins": "m", "minute": "m", "minutes": "m",
+    "h": "h", "hr": "h", "hrs": "h", "hour": "h", "hours": "h",
+    "d": "d", "day": "d", "days": "d",
+    "w": "w", "week": "w", "weeks": "w",
+    "mon": "mon", "month": "mon", "months": "mon",
+    "q": "q", "qtr": "q", "quarter": "q", "quarters": "q",
+    "y": "y", "yr": "y", "year": "y", "years": "y",
+}
+
+
+def normalize_spl(query: str) -> str:
+    """Whitespace-insensitive form of a search: collapsed runs of blanks, tidy pipes."""
+    q = re.sub(r"\s+", " ", query or "").strip()
+    return re.sub(r"\s*\|\s*", " | ", q)
+
+
+def _add_months(dt: datetime, months: int) -> datetime:
+    y, m = divmod(dt.month - 1 + months, 12)
+    y += dt.year
+    return dt.replace(year=y, month=m + 1, day=min(dt.day, calendar.monthrange(y, m + 1)[1]))
+
+
+def _snap(dt: datetime, unit: str) -> datetime:
+    if unit == "s":
+        return dt.replace(microsecond=0)
+    if unit == "m":
+        return dt.replace(second=0, microsecond=0)
+    if unit == "h":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "d":
+        return day
+    if unit == "w":
+        return day - timedelta(days=(day.weekday() + 1) % 7)  # Splunk @w = Sunday
+    if unit == "mon":
+        return day.replace(day=1)
+    if unit == "q":
+        return day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+    if unit == "y":
+        return day.replace(month=1, day=1)
+    raise ValueError(unit)
+
+
+def resolve_time_modifier(value: str, now: datetime) -> Optional[float]:
+    """
+    Resolves a Splunk earliest/latest value ("-13mon", "-30d@d", "@mon", "now", epoch) to
+    epoch seconds relative to `now`. Returns None for forms we do not understand.
+    """
+    v = (value or "").strip().strip('"')
+    if not v:
+        return None
+    if v.lower() == "now":
+        return now.timestamp()
+    try:
+        return float(v)
+    except ValueError:
+        pass
+    m = _RELATIVE_RE.match(v)
+    if not m or not (m.group(1) or m.group(3)):
+        return None
+    offset, unit, snap = m.group(1), m.group(2), m.group(3)
+    dt = now
+    if offset:
+        n = int(offset[1:] or 1) * (-1 if offset[0] == "-" else 1)
+        u = _UNIT_ALIASES.get((unit or "s").lower())
+        if u in ("mon", "q", "y"):
+            dt = _add_months(dt, n * {"mon": 1, "q": 3, "y": 12}[u])
+        else:
+            dt = dt + timedelta(seconds=n * {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}[u])
+    if snap:
+        u = _UNIT_ALIASES.get(snap.lower())
+        if u is None:
+            return None
+        dt = _snap(dt, u)
+    return dt.timestamp()
+
+
+def _time_bounds(query: str, now: datetime) -> Tuple[Any, Any]:
+    bounds: Dict[str, Any] = {"earliest": None, "latest": "now"}
+    for name, value in _TIME_TOKEN_RE.findall(query or ""):
+        bounds[name.lower()] = value
+    resolved = []
+    for name in ("earliest", "latest"):
+        raw = bounds[name]
+        if raw is None:
+            resolved.append(None)
+            continue
+        t = resolve_time_modifier(raw, now)
+        resolved.append(t if t is not None else str(raw))
+    return resolved[0], resolved[1]
+
+
+def _classify(query: str, now: datetime) -> Tuple[str, int, int]:
+    earliest, latest = _time_bounds(query, now)
+    if isinstance(earliest, float):
+        end = latest if isinstance(latest, float) else now.timestamp()
+        span = end - earliest
+    else:
+        span = float("inf") if earliest is None else 0
+    for name, min_span, ttl, resolution in _QUERY_CLASSES:
+        if span >= min_span:
+            break
+    return name, get_env_int(f"SPLUNK_CACHE_TTL_{name.upper()}", ttl, minimum=0), resolution
+
+
+class SplunkResultCache:
+    """
+    Persistent Splunk result cache keyed by host, normalized SPL and the resolved time window.
+    TTLs depend on the query class (history / window / recent, see _QUERY_CLASSES) and can be
+    overridden with SPLUNK_CACHE_TTL_<CLASS> (seconds, 0 disables caching for that class).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        path = path or os.getenv("SPLUNK_CACHE_PATH") or os.path.join(LOCAL_CACHE_DIR, "splunk_results.sqlite")
+        max_bytes = max_bytes or get_env_int("SPLUNK_CACHE_MAX_MB", 512) * 1024 * 1024
+        self.store = DiskCache(path, max_bytes)
+        self.max_rows = get_env_int("SPLUNK_CACHE_MAX_ROWS", 200000)
+
+    def key_for(self, host: str, query: str) -> Tuple[str, str, int]:
+        """Returns (cache key, query class, ttl)."""
+        wall = datetime.now(timezone.utc)
+        cls, ttl, resolution = _classify(query, wall)
+        now = datetime.fromtimestamp(int(wall.timestamp()) // resolution * resolution, tz=timezone.utc)
+        earliest, latest = _time_bounds(query, now)
+        material = "\x1f".join([host.rstrip("/"), normalize_spl(query), str(earliest), str(latest)])
+        return hashlib.sha256(material.encode()).hexdigest(), cls, ttl
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        return self.store.get(key)
+
+    def set(self, key: str, rows: List[Dict[str, Any]], ttl: int) -> None:
+        if ttl > 0 and len(rows) <= self.max_rows:
+            self.store.set(key, rows, ttl=ttl)
+
+
+_CACHE: Optional[SplunkResultCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache() -> Optional[SplunkResultCache]:
+    """Process-wide result cache, or None when SPLUNK_CACHE_BYPASS is set or the cache cannot be opened."""
+    global _CACHE
+    if get_env_bool("SPLUNK_CACHE_BYPASS", False):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                _CACHE = SplunkResultCache()
+            except Exception as e:
+                print(f"[splunk] result cache unavailable: {e}")
+                return None
+        return _CACHE
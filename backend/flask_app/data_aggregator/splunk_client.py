@@ -0,0 +1,648 @@
+# backend/flask_app/data_aggregator/splunk_client.py
+import heapq
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .splunk_cache import get_result_cache
+from .utils.env_constants import LOCAL_CACHE_DIR
+from .utils.env_utils import get_env_bool, get_env_float, get_env_int
+from .utils.network_utils import get_amex_proxies_verified
+
+try:
+    from amexcerts import certificate_path as _amex_cert_path
+except Exception:
+    _amex_cert_path = None
+
+_EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _splunk_bases(host: str) -> List[str]:
+    """
+    Try in order:
+      1) API VIP native REST (/services)
+      2) UI VIP raw proxy (/splunkd/__raw/services)
+      3) UI VIP locale+raw proxy (/en-US/splunkd/__raw/services)
+    The code auto-detects JSON vs HTML and falls back.
+    """
+    return [f"{host}/services", f"{host}/splunkd/__raw/services", f"{host}/en-US/splunkd/__raw/services"]
+
+
+def _is_json(resp: requests.Response) -> bool:
+    return resp.headers.get("Content-Type", "").lower().startswith("application/json")
+
+
+def _as_int(v: Any) -> Optional[int]:
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+
+def _iter_export_rows(resp: requests.Response) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally parses a /search/jobs/export body (output_mode=json).
+    Splunk emits one JSON object per line ({"preview":..,"result":{..}}); we unwrap
+    `result`, skip preview rows and message-only lines, and never hold the full body.
+    A non-streamed {"results":[..]} document on a single line is also accepted.
+    """
+    for line in resp.iter_lines(chunk_size=_EXPORT_CHUNK_BYTES):
+        if not line or not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(obj, dict):
+            continue
+        if isinstance(obj.get("result"), dict):
+            if not obj.get("preview"):
+                yield obj["result"]
+        elif isinstance(obj.get("results"), list):
+            for r in obj["results"]:
+                if isinstance(r, dict):
+                    yield r
+
+
+def _iter_result_pages(
+    fetch_page: Callable[[int, int], List[Dict[str, Any]]],
+    expected: Optional[int],
+    page_size: int,
+    prefetch: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Pulls /search/jobs/{sid}/results with offset paging and yields rows page by page.
+    Paging continues until `expected` (the job resultCount) rows arrived, or without it until
+    an empty page. A short page does not end the result: the server caps a page at its
+    maxresultrows, which may be below page_size. With prefetch, the next page is requested
+    while the caller is still consuming the current one.
+    """
+    def _more(offset: int, last_len: int) -> bool:
+        if last_len == 0:
+            return False
+        return expected is None or offset < expected
+
+    if not prefetch:
+        offset = 0
+        while True:
+            page = fetch_page(offset, page_size)
+            yield from page
+            offset += len(page)
+            if not _more(offset, len(page)):
+                return
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="splunk-page") as pool:
+        offset = 0
+        pending = pool.submit(fetch_page, offset, page_size)
+        while pending is not None:
+            page = pending.result()
+            offset += len(page)
+            pending = pool.submit(fetch_page, offset, page_size) if _more(offset, len(page)) else None
+            yield from page
+
+
+class SplunkClient:
+    """
+    Long-lived Splunk REST client.
+    - One requests.Session (keep-alive pool) and one proxy/TLS resolution per client.
+    - Remembers which base path answered for a host and persists it in SPLUNK_STATE_PATH,
+      so later runs go straight to the working base instead of probing dead ones.
+    - Auth: SPLUNK_TOKEN header if set; otherwise logs in once for a session key and only
+      falls back to basic auth when /auth/login is not reachable (e.g. behind the UI WAF).
+    """
+
+    def __init__(self, host: str, user: str, pwd: str, verify_tls: bool = True, state_path: Optional[str] = None):
+        self.host = (host or "").rstrip("/")
+        self.user = user
+        self.pwd = pwd
+        self.verify = _amex_cert_path() if (_amex_cert_path and verify_tls) else verify_tls
+        self.state_path = state_path or os.getenv("SPLUNK_STATE_PATH") or os.path.join(LOCAL_CACHE_DIR, "splunk_state.json")
+        self.connect_timeout = get_env_int("SPLUNK_CONNECT_TIMEOUT", 5)
+
+        pool_size = get_env_int("SPLUNK_POOL_SIZE", 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Prefer explicit Amex helper if creds are set; else honor generic env proxies
+        amex = get_amex_proxies_verified()
+        if amex:
+            self.session.proxies.update(amex)
+            print("[splunk] using Amex corporate proxy")
+        else:
+            p_http = os.getenv("HTTP_PROXY"); p_https = os.getenv("HTTPS_PROXY")
+            if p_http or p_https:
+                self.session.proxies.update({"http": p_http, "https": p_https})
+                print(f"[splunk] using proxy http={p_http!s} https={p_https!s}")
+
+        self._lock = threading.Lock()
+        self._token = os.getenv("SPLUNK_TOKEN") or None
+        self._session_keys: Dict[str, Optional[str]] = {}
+        self._base: Optional[str] = self._load_state().get(self.host)
+
+    # ---------------- base-path discovery ----------------
+
+    def _load_state(self) -> Dict[str, str]:
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            return state.get("bases", {}) if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _remember_base(self, base: str) -> None:
+        with self._lock:
+            if self._base == base:
+                return
+            self._base = base
+            state = self._load_state()
+            state[self.host] = base
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+                with open(self.state_path, "w") as f:
+                    json.dump({"bases": state}, f, indent=2)
+            except OSError as e:
+                print(f"[splunk] could not persist base path: {e}")
+        print(f"[splunk] remembered base {base}")
+
+    def _forget_base(self, base: str) -> None:
+        with self._lock:
+            if self._base == base:
+                self._base = None
+
+    def bases(self) -> List[str]:
+        """Known-good base first, then the remaining candidates in their usual order."""
+        candidates = _splunk_bases(self.host)
+        if self._base in candidates:
+            candidates.remove(self._base)
+            candidates.insert(0, self._base)
+        return candidates
+
+    # ---------------- auth + requests ----------------
+
+    def _login(self, base: str) -> Optional[str]:
+        try:
+            r = self.session.post(
+                f"{base}/auth/login",
+                data={"username": self.user, "password": self.pwd, "output_mode": "json"},
+                timeout=(self.connect_timeout, 30), verify=self.verify,
+            )
+            if r.status_code == 200 and _is_json(r):
+                key = (r.json() or {}).get("sessionKey")
+                if key:
+                    print(f"[splunk] obtained session key via {base}/auth/login")
+                    return key
+            print(f"[splunk] login status={r.status_code} ct={r.headers.get('Content-Type')}; using basic auth")
+        except requests.RequestException as e:
+            print(f"[splunk] login error: {e}; using basic auth")
+        return None
+
+    def _session_key(self, base: str, refresh: bool = False) -> Optional[str]:
+        with self._lock:
+            if refresh or base not in self._session_keys:
+                self._session_keys[base] = self._login(base)
+            return self._session_keys[base]
+
+    def request(self, method: str, base: str, path: str, timeout: float = 30, **kwargs) -> requests.Response:
+        """Issues a request against base+path with the client's auth, TLS and timeouts; re-logs in once on 401."""
+        extra_headers = kwargs.pop("headers", None) or {}
+        for attempt in (0, 1):
+            headers = dict(extra_headers)
+            auth = None
+            if self._token:
+                headers["Authorization"] = f"Splunk {self._token}"
+            else:
+                key = self._session_key(base, refresh=attempt == 1)
+                if key:
+                    headers["Authorization"] = f"Splunk {key}"
+                else:
+                    auth = (self.user, self.pwd)
+            resp = self.session.request(
+                method, f"{base}{path}", headers=headers or None, auth=auth,
+                timeout=(self.connect_timeout, timeout), verify=self.verify, **kwargs,
+            )
+            if resp.status_code == 401 and not self._token and attempt == 0 and self._session_keys.get(base):
+                print("[splunk] session key rejected; logging in again")
+                resp.close()
+                continue
+            return resp
+        return resp
+
+    # ---------------- jobs ----------------
+
+    def create_job(self, base: str, query: str, **params: Any) -> Optional[str]:
+        print(f"[splunk] POST {base}/search/jobs")
+        r = self.request("POST", base, "/search/jobs",
+                         data={"search": f"search {query}", "output_mode": "json", **params})
+        print(f"[splunk] create status={r.status_code} ct={r.headers.get('Content-Type')}")
+        if r.status_code not in (200, 201):
+            print(f"[splunk] create body(head): {r.text[:200]}")
+            return None
+        if not _is_json(r):
+            print("[splunk] create returned non-JSON (likely WAF)")
+            return None
+        sid = (r.json() or {}).get("sid")
+        if not sid:
+            print("[splunk] no SID in JSON")
+        return sid
+
+    def job_status(self, base: str, sid: str) -> Optional[Dict[str, Any]]:
+        """Returns the job's `content` dict, or None when the poll did not return JSON."""
+        j = self.request("GET", base, f"/search/jobs/{sid}", params={"output_mode": "json"})
+        if j.status_code != 200:
+            print(f"[splunk] poll status={j.status_code} body(head): {j.text[:200]}")
+            return None
+        if not _is_json(j):
+            print("[splunk] poll non-JSON")
+            return None
+        entry = ((j.json() or {}).get("entry") or [{}])[0]
+        return entry.get("content", {}) or {}
+
+    def cancel_job(self, base: str, sid: str) -> None:
+        try:
+            self.request("POST", base, f"/search/jobs/{sid}/control", data={"action": "cancel", "output_mode": "json"})
+        except requests.RequestException as e:
+            print(f"[splunk] cancel sid={sid} failed: {e}")
+
+    def wait_for_job(self, base: str, sid: str) -> Optional[Dict[str, Any]]:
+        poller = SplunkJobPoller(self)
+        poller.add(sid, base, sid)
+        return poller.run().get(sid)
+
+    def iter_job_results(self, base: str, sid: str, expected: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        def _fetch_page(offset: int, count: int) -> List[Dict[str, Any]]:
+            res = self.request("GET", base, f"/search/jobs/{sid}/results",
+                               params={"output_mode": "json", "offset": offset, "count": count}, timeout=60)
+            print(f"[splunk] results offset={offset} status={res.status_code} ct={res.headers.get('Content-Type')}")
+            if res.status_code != 200:
+                raise RuntimeError(f"results status={res.status_code} body(head): {res.text[:200]}")
+            if not _is_json(res):
+                raise RuntimeError("results non-JSON")
+            return (res.json() or {}).get("results", []) or []
+
+        # Splunk caps a single /results response at maxresultrows (50,000 by default)
+        page_size = get_env_int("SPLUNK_RESULTS_PAGE_SIZE", 50000)
+        prefetch = get_env_bool("SPLUNK_RESULTS_PREFETCH", True)
+        n = 0
+        for row in _iter_result_pages(_fetch_page, expected, page_size, prefetch):
+            n += 1
+            yield row
+        if expected is not None and n != expected:
+            print(f"[splunk] WARNING sid={sid} returned {n} rows but job resultCount={expected}")
+        else:
+            print(f"[splunk] sid={sid} returned {n} rows (resultCount={expected})")
+
+    # ---------------- searches ----------------
+
+    def _cache_lookup(self, query: str, use_cache: bool):
+        """Returns (cache, key, ttl, cached rows or None); cache is None when caching is off."""
+        cache = get_result_cache() if use_cache else None
+        if cache is None:
+            return None, None, 0, None
+        key, cls, ttl = cache.key_for(self.host, query)
+        rows = cache.get(key) if ttl > 0 else None
+        if rows is not None:
+            print(f"[splunk] cache hit ({cls}, {len(rows)} rows)")
+        return cache, key, ttl, rows
+
+    def iter_search(self, query: str, use_cache: bool = True,
+                    status: Optional[Dict[str, bool]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields rows from the result cache when possible, otherwise streams the search in
+        constant memory. A streamed result is not written to the cache (that would mean
+        holding it all); use search() for results worth caching.
+        status["ok"] is set as in _iter_search_uncached (and on a cache hit).
+        """
+        status = status if status is not None else {}
+        cache, key, ttl, cached = self._cache_lookup(query, use_cache)
+        if cached is not None:
+            yield from cached
+            status["ok"] = True
+            return
+        yield from self._iter_search_uncached(query, status)
+
+    def _iter_search_uncached(self, query: str, status: Optional[Dict[str, bool]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Runs a search and yields result rows as they are parsed (constant memory on export).
+        Tries export first, then create + poll + paged results, on each base in turn.
+        Falls back to the next base only while nothing has been yielded yet, and not once a
+        job has failed or timed out on a base; a failure mid-stream is raised so callers never
+        see silently truncated results.
+        status["ok"] is set once a base answered, so callers can tell "no rows" from "failed".
+        """
+        status = status if status is not None else {}
+        for base in self.bases():
+            yielded = 0
+            try:
+                # First, try export (oneshot) to avoid WAF redirects to HTML login pages
+                print(f"[splunk] EXPORT {base}/search/jobs/export (token={bool(self._token)})")
+                with self.request("POST", base, "/search/jobs/export",
+                                  data={"search": f"search {query}", "output_mode": "json"},
+                                  timeout=60, stream=True) as exp:
+                    print(f"[splunk] export status={exp.status_code} ct={exp.headers.get('Content-Type', '')}")
+                    if exp.status_code == 200 and _is_json(exp):
+                        self._remember_base(base)
+                        for row in _iter_export_rows(exp):
+                            yielded += 1
+                            yield row
+                if yielded:
+                    print(f"[splunk] export streamed {yielded} rows")
+                    status["ok"] = True
+                    return
+
+                # Fall back to create + poll pattern
+                sid = self.create_job(base, query)
+                if not sid:
+                    print("[splunk] trying next base")
+                    continue
+                self._remember_base(base)
+                job = self.wait_for_job(base, sid)
+                if job is None:
+                    # the job ran on this base and failed or timed out; re-dispatching it on
+                    # another base would only repeat that, so report the search as failed
+                    print(f"[splunk] sid={sid} did not complete on {base}; not retrying on another base")
+                    return
+                for row in self.iter_job_results(base, sid, _as_int(job.get("resultCount"))):
+                    yielded += 1
+                    yield row
+                status["ok"] = True
+                return
+
+            except Exception as e:
+                if yielded:
+                    raise RuntimeError(f"[splunk] stream from {base} failed after {yielded} rows: {e}") from e
+                self._forget_base(base)
+                print(f"[splunk] base={base} error: {e} — trying alternate base...")
+                continue
+
+        print("[splunk] all bases failed — check VPN/proxy/host/creds")
+
+    def search(self, query: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """All rows of a search; served from and stored in the result cache (up to SPLUNK_CACHE_MAX_ROWS)."""
+        cache, key, ttl, cached = self._cache_lookup(query, use_cache)
+        if cached is not None:
+            return cached
+        status: Dict[str, bool] = {}
+        rows = list(self._iter_search_uncached(query, status))
+        if cache is not None and status.get("ok"):
+            cache.set(key, rows, ttl)
+        return rows
+
+    def _dispatch(self, query: str) -> Optional[Tuple[str, str]]:
+        for base in self.bases():
+            try:
+                sid = self.create_job(base, query)
+            except requests.RequestException as e:
+                self._forget_base(base)
+                print(f"[splunk] base={base} error: {e} — trying alternate base...")
+                continue
+            if sid:
+                self._remember_base(base)
+                return base, sid
+        return None
+
+    def run_searches(self, queries: Dict[str, str], max_concurrent: Optional[int] = None,
+                     use_cache: bool = True) -> Dict[str, Optional[List[Dict[str, Any]]]]:
+        """
+        Dispatches several searches as concurrent Splunk jobs (at most max_concurrent in
+        flight), tracks them all from one SplunkJobPoller loop and returns results by key
+        once every job has finished. Cached results are served without dispatching a job.
+        A query whose job cannot be created falls back to the export path, so WAF-fronted
+        hosts still work; exports run on a background thread so polling of the other jobs
+        continues meanwhile.
+        A search that failed (timed out, reported failed, its results could not be read, or it
+        could not be run at all) maps to None rather than to partial rows, so callers can tell
+        it apart from an empty result. If the loop is left early, jobs still in flight are
+        cancelled rather than left running on the search head.
+        """
+        limit = max_concurrent or len(queries) or 1
+        poller = SplunkJobPoller(self)
+        jobs: Dict[str, Tuple[str, str]] = {}
+        out: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+        cache_slots: Dict[str, Tuple[Any, str, int]] = {}
+        queue = []
+        for key, query in queries.items():
+            cache, ckey, ttl, cached = self._cache_lookup(query, use_cache)
+            if cached is not None:
+                out[key] = cached
+                continue
+            if cache is not None and ttl > 0:
+                cache_slots[key] = (cache, ckey, ttl)
+            queue.append((key, query))
+
+        exports: Dict[str, Future] = {}
+        export_pool: Optional[ThreadPoolExecutor] = None
+
+        def _export(query: str) -> Optional[List[Dict[str, Any]]]:
+            status: Dict[str, bool] = {}
+            rows = list(self._iter_search_uncached(query, status))
+            return rows if status.get("ok") else None
+
+        def _store(key: str, rows: Optional[List[Dict[str, Any]]]) -> None:
+            out[key] = rows
+            if rows is not None and key in cache_slots:
+                cache, ckey, ttl = cache_slots[key]
+                cache.set(ckey, rows, ttl)
+
+        def _fill() -> None:
+            nonlocal export_pool
+            while queue and poller.pending() + len(exports) < limit:
+                key, query = queue.pop(0)
+                dispatched = self._dispatch(query)
+                if dispatched is None:
+                    print(f"[splunk] could not create a job for '{key}'; falling back to export")
+                    if export_pool is None:
+                        export_pool = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="splunk-export")
+                    exports[key] = export_pool.submit(_export, query)
+                    continue
+                jobs[key] = dispatched
+                poller.add(key, *dispatched)
+
+        try:
+            _fill()
+            while poller.pending() or exports:
+                if poller.pending():
+                    # wake up regularly while exports run, to collect them
+                    finished = poller.step(max_wait=max(0.25, poller.min_interval) if exports else None)
+                else:
+                    wait(exports.values(), return_when=FIRST_COMPLETED)
+                    finished = []
+                for key, future in [(k, f) for k, f in exports.items() if f.done()]:
+                    del exports[key]
+                    try:
+                        _store(key, future.result())
+                    except Exception as e:
+                        print(f"[splunk] export for '{key}' failed: {e}")
+                        out[key] = None
+                for key, job in finished:
+                    base, sid = jobs[key]
+                    if job is None:
+                        print(f"[splunk] search '{key}' failed; no results kept")
+                        out[key] = None
+                        continue
+                    try:
+                        rows = list(self.iter_job_results(base, sid, _as_int(job.get("resultCount"))))
+                    except (RuntimeError, requests.RequestException, ValueError) as e:
+                        print(f"[splunk] search '{key}' results could not be read: {e}")
+                        rows = None
+                    _store(key, rows)
+                _fill()
+        finally:
+            poller.cancel_all()
+            if export_pool is not None:
+                export_pool.shutdown(wait=False, cancel_futures=True)
+        return {key: out.get(key) for key in queries}
+
+
+def _next_poll_delay(job: Dict[str, Any], elapsed: float, min_interval: float, max_interval: float) -> float:
+    """
+    Adaptive poll interval for one job:
+    - QUEUED/PARSING jobs back off with their age (nothing to gain from polling fast);
+    - RUNNING/FINALIZING jobs are polled at about half of the remaining run time,
+      estimated from runDuration and doneProgress;
+    - without progress information the interval grows with the job's age.
+    """
+    state = str(job.get("dispatchState") or "").upper()
+    if state in ("QUEUED", "PARSING"):
+        delay = max(1.0, elapsed / 2)
+    else:
+        try:
+            progress = float(job.get("doneProgress") or 0)
+        except (TypeError, ValueError):
+            progress = 0.0
+        try:
+            run = float(job.get("runDuration") or elapsed)
+        except (TypeError, ValueError):
+            run = elapsed
+        if 0 < progress < 1:
+            delay = run * (1 - progress) / progress / 2
+        elif state == "FINALIZING" or progress >= 1:
+            delay = min_interval
+        else:
+            delay = elapsed / 4
+    return min(max_interval, max(min_interval, delay))
+
+
+class SplunkJobPoller:
+    """
+    Tracks many search jobs (SIDs) from a single loop. Each job has its own due time
+    computed by _next_poll_delay, so short searches are picked up quickly and long ones
+    are polled rarely, without a blocking thread per job.
+    """
+
+    def __init__(self, client: SplunkClient, min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None, timeout: Optional[float] = None,
+                 max_poll_failures: Optional[int] = None):
+        self.client = client
+        self.min_interval = min_interval if min_interval is not None else get_env_float("SPLUNK_POLL_MIN_SECONDS", 0.25)
+        self.max_interval = max_interval if max_interval is not None else get_env_float("SPLUNK_POLL_MAX_SECONDS", 30.0)
+        self.timeout = timeout if timeout is not None else float(get_env_int("SPLUNK_JOB_TIMEOUT", 900))
+        self.max_poll_failures = (max_poll_failures if max_poll_failures is not None
+                                  else get_env_int("SPLUNK_POLL_MAX_FAILURES", 5))
+        self._heap: List[Tuple[float, int, str]] = []
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self.polls = 0
+
+    def add(self, key: str, base: str, sid: str) -> None:
+        now = time.monotonic()
+        self._jobs[key] = {"base": base, "sid": sid, "started": now, "poll_failures": 0}
+        self._seq += 1
+        heapq.heappush(self._heap, (now + self.min_interval, self._seq, key))
+
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    def cancel_all(self) -> None:
+        """Cancels every job still tracked, e.g. when the caller gives up on the batch."""
+        for info in self._jobs.values():
+            self.client.cancel_job(info["base"], info["sid"])
+        self._jobs.clear()
+        self._heap.clear()
+
+    def step(self, max_wait: Optional[float] = None) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Sleeps until the next job is due (at most max_wait seconds, when given), polls every
+        due job once and returns the jobs that finished as (key, content). content is None when the job failed: Splunk reports
+        it as failed, it could not be polled max_poll_failures times in a row, or it ran past
+        the timeout. The last two are cancelled, and partial results are never read.
+        A failed poll (transport error, non-200 or non-JSON reply) is retried with backoff.
+        """
+        if not self._heap:
+            return []
+        due = self._heap[0][0]
+        delay = due - time.monotonic()
+        if max_wait is not None:
+            delay = min(delay, max_wait)
+        if delay > 0:
+            time.sleep(delay)
+
+        finished: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            info = self._jobs[key]
+            self.polls += 1
+            try:
+                job = self.client.job_status(info["base"], info["sid"])
+            except (requests.RequestException, ValueError) as e:
+                print(f"[splunk] poll sid={info['sid']} failed: {e}")
+                job = None
+            elapsed = time.monotonic() - info["started"]
+            if job is None:
+                info["poll_failures"] += 1
+                if info["poll_failures"] >= self.max_poll_failures or elapsed >= self.timeout:
+                    print(f"[splunk] sid={info['sid']} could not be polled {info['poll_failures']} time(s) "
+                          f"in {elapsed:.0f}s; cancelling")
+                    self.client.cancel_job(info["base"], info["sid"])
+                    finished.append((key, None))
+                else:
+                    delay = min(self.max_interval, max(1.0, self.min_interval) * 2 ** info["poll_failures"])
+                    self._seq += 1
+                    heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, key))
+                continue
+            info["poll_failures"] = 0
+            if job.get("isDone") and job.get("isFailed"):
+                print(f"[splunk] sid={info['sid']} failed after {elapsed:.1f}s ({job.get('dispatchState')})")
+                finished.append((key, None))
+            elif job.get("isDone"):
+                print(f"[splunk] sid={info['sid']} done in {elapsed:.1f}s ({job.get('dispatchState')})")
+                finished.append((key, job))
+            elif elapsed >= self.timeout:
+                print(f"[splunk] sid={info['sid']} still {job.get('dispatchState')} after {elapsed:.0f}s; cancelling")
+                self.client.cancel_job(info["base"], info["sid"])
+                finished.append((key, None))
+            else:
+                delay = _next_poll_delay(job, elapsed, self.min_interval, self.max_interval)
+                self._seq += 1
+                heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, key))
+        for key, _ in finished:
+            del self._jobs[key]
+        return finished
+
+    def run(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        out: Dict[str, Optional[Dict[str, Any]]] = {}
+        while self._jobs:
+            out.update(self.step())
+        return out
+
+
+_CLIENTS: Dict[Tuple[str, str, bool], SplunkClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_splunk_client(host: str, user: str, pwd: str, verify_tls: bool = True) -> SplunkClient:
+    """Process-wide SplunkClient per (host, user, verify_tls), so every search in a run shares one pool and login."""
+    key = ((host or "").rstrip("/"), user, bool(verify_tls))
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = _CLIENTS[key] = SplunkClient(host, user, pwd, verify_tls)
+        return client
@@ -0,0 +1,104 @@
+# backend/flask_app/data_aggregator/splunk_sharding.py
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from .splunk_client import SplunkClient
+
+# How partial aggregates from different slices combine, per output field.
+# Distinct counts are deliberately absent: dc() over slices cannot be added, so sharded
+# searches emit the distinct keys themselves (e.g. "by consumer, month") and the
+# caller counts them after merging.
+MERGE_OPS = {
+    "sum": lambda a, b: a + b,
+    "max": max,
+    "min": min,
+}
+
+
+def _num(v: Any) -> Optional[float]:
+    if v in (None, ""):
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def time_slices(start: date, end: date, span: str, tz: str) -> List[Tuple[int, int]]:
+    """
+    Splits [start, end) into month ("mon") or day ("d") slices and returns them as
+    (earliest, latest) epoch seconds at local midnight in `tz`, ready for
+    `earliest=... latest=...` in SPL.
+    """
+    if span not in ("mon", "d"):
+        raise ValueError(f"Unsupported shard span '{span}' (use 'mon' or 'd')")
+    zone = ZoneInfo(tz)
+
+    def _epoch(d: date) -> int:
+        return int(datetime(d.year, d.month, d.day, tzinfo=zone).timestamp())
+
+    out: List[Tuple[int, int]] = []
+    cur = start if span == "d" else start.replace(day=1)
+    while cur < end:
+        if span == "d":
+            nxt = cur + timedelta(days=1)
+        else:
+            nxt = date(cur.year + (cur.month // 12), cur.month % 12 + 1, 1)
+        out.append((_epoch(max(cur, start)), _epoch(min(nxt, end))))
+        cur = nxt
+    return out
+
+
+def combine_partials(rows: Iterable[Dict[str, Any]], key_fields: Sequence[str],
+                     spec: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Merges partial aggregate rows from several slices: rows with the same key_fields are
+    folded field by field with the MERGE_OPS named in `spec`. Fields not in spec are dropped.
+    """
+    merged: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for r in rows:
+        key = tuple(r.get(k) for k in key_fields)
+        if any(k in (None, "") for k in key):
+            continue
+        acc = merged.get(key)
+        if acc is None:
+            acc = merged[key] = dict(zip(key_fields, key))
+        for field, op in spec.items():
+            v = _num(r.get(field))
+            if v is None:
+                continue
+            acc[field] = v if acc.get(field) is None else MERGE_OPS[op](acc[field], v)
+    return list(merged.values())
+
+
+def run_sliced(client: SplunkClient, templates: Dict[str, str], fmt: Dict[str, Any],
+               slices: Dict[str, List[Tuple[int, int]]], max_concurrent: Optional[int] = None,
+               failed: Optional[Dict[str, List[Tuple[int, int]]]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Runs every template once per slice as separate Splunk jobs (all tracked by one poller)
+    and returns the concatenated partial rows per template name. Templates must accept
+    {earliest} and {latest}.
+    A slice whose search failed contributes no rows. Its (earliest, latest) is recorded in
+    `failed` under the template name; without a `failed` dict any failure raises RuntimeError,
+    since the partials would silently undercount.
+    """
+    queries: Dict[str, str] = {}
+    for name, tmpl in templates.items():
+        for i, (earliest, latest) in enumerate(slices[name]):
+            queries[f"{name}:{i}"] = tmpl.format(**fmt, earliest=earliest, latest=latest)
+    print(f"[splunk] running {len(queries)} sliced searches for {sorted(templates)}")
+    results = client.run_searches(queries, max_concurrent=max_concurrent)
+    out: Dict[str, List[Dict[str, Any]]] = {name: [] for name in templates}
+    lost: Dict[str, List[Tuple[int, int]]] = {}
+    for key, rows in results.items():
+        name, i = key.rsplit(":", 1)
+        if rows is None:
+            lost.setdefault(name, []).append(slices[name][int(i)])
+            continue
+        out[name].extend(rows)
+    if lost:
+        if failed is None:
+            raise RuntimeError(f"{sum(map(len, lost.values()))} sliced searches failed for {sorted(lost)}")
+        failed.update(lost)
+    return out
@@ -0,0 +1,195 @@
+import io
+import os
+import posixpath
+import zipfile
+from typing import Any, Dict, List, Optional
+from xml.etree.ElementTree import iterparse
+
+# SDK methods that may export a revision bundle, tried in order (the SDK has had several names)
+BUNDLE_DOWNLOAD_METHODS = (
+    "export_proxy_revision",
+    "export_api_proxy_revision",
+    "download_proxy_revision",
+    "download_proxy_bundle",
+    "get_proxy_bundle",
+    "export_proxy",
+)
+
+
+def bundle_download_method(apigee_obj) -> Optional[str]:
+    """Name of the first bundle export method the SDK's proxy API offers, or None."""
+    proxy_api = getattr(apigee_obj, "proxy", None)
+    for name in BUNDLE_DOWNLOAD_METHODS:
+        if callable(getattr(proxy_api, name, None)):
+            return name
+    return None
+
+
+def download_proxy_bundle(apigee_obj, proxy: str, revision: str) -> bytes:
+    """The revision's bundle zip, whatever form the SDK returns it in (bytes, response, file path, stream)."""
+    name = bundle_download_method(apigee_obj)
+    if name is None:
+        raise RuntimeError("Apigee SDK has no bundle export method")
+    bundle = getattr(apigee_obj.proxy, name)(proxy, revision)
+    if hasattr(bundle, "content"):
+        bundle = bundle.content
+    elif hasattr(bundle, "read"):
+        bundle = bundle.read()
+    elif isinstance(bundle, str) and os.path.isfile(bundle):
+        with open(bundle, "rb") as f:
+            bundle = f.read()
+    if not isinstance(bundle, (bytes, bytearray)):
+        raise TypeError(f"unexpected bundle type {type(bundle).__name__} from proxy.{name}")
+    return bytes(bundle)
+
+
+# ---------------- streaming XML -> small trees ----------------
+
+def _read_tree(fp) -> Dict[str, Any]:
+    """
+    Parses one XML file incrementally into {"tag", "attrib", "text", "children"} nodes.
+    Elements are cleared as soon as they end, so only the compact node tree is kept.
+    """
+    stack: List[Dict[str, Any]] = []
+    root = None
+    for event, elem in iterparse(fp, events=("start", "end")):
+        if event == "start":
+            node = {"tag": elem.tag, "attrib": dict(elem.attrib), "text": None, "children": []}
+            if stack:
+                stack[-1]["children"].append(node)
+            else:
+                root = node
+            stack.append(node)
+        else:
+            node = stack.pop()
+            node["text"] = (elem.text or "").strip() or None
+            elem.clear()
+    return root or {"tag": None, "attrib": {}, "text": None, "children": []}
+
+
+def _child(node: Optional[Dict[str, Any]], *path: str) -> Optional[Dict[str, Any]]:
+    for tag in path:
+        if node is None:
+            return None
+        node = next((c for c in node["children"] if c["tag"] == tag), None)
+    return node
+
+
+def _children(node: Optional[Dict[str, Any]], tag: str) -> List[Dict[str, Any]]:
+    return [c for c in node["children"] if c["tag"] == tag] if node else []
+
+
+def _text(node: Optional[Dict[str, Any]], *path: str) -> Optional[str]:
+    found = _child(node, *path)
+    return found["text"] if found else None
+
+
+def _lower_first(tag: str) -> str:
+    return tag[:1].lower() + tag[1:]
+
+
+# ---------------- bundle files -> management API shapes ----------------
+
+def _steps(request: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    steps = []
+    for step in _children(request, "Step"):
+        entry = {"name": _text(step, "Name")}
+        condition = _text(step, "Condition")
+        if condition:
+            entry["condition"] = condition
+        steps.append({"Step": entry})
+    return steps
+
+
+def _flow(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": node["attrib"].get("name"),
+        "condition": _text(node, "Condition"),
+        "request": {"children": _steps(_child(node, "Request"))},
+        "response": {"children": _steps(_child(node, "Response"))},
+    }
+
+
+def _proxy_endpoint(root: Dict[str, Any]) -> Dict[str, Any]:
+    """ProxyEndpoint XML in the shape of proxy.get_proxy_endpoint_details."""
+    conn = _child(root, "HTTPProxyConnection")
+    out: Dict[str, Any] = {
+        "name": root["attrib"].get("name"),
+        "connection": {
+            "basePath": _text(conn, "BasePath"),
+            "virtualHost": [v["text"] for v in _children(conn, "VirtualHost") if v["text"]],
+        },
+        "flows": [_flow(f) for f in _children(_child(root, "Flows"), "Flow")],
+    }
+    for tag in ("PreFlow", "PostFlow"):
+        flow = _child(root, tag)
+        if flow is not None:
+            out[_lower_first(tag)] = _flow(flow)
+    return out
+
+
+def _target_endpoint(root: Dict[str, Any]) -> Dict[str, Any]:
+    """TargetEndpoint XML in the shape of proxy.get_proxy_target_by_name."""
+    conn = _child(root, "HTTPTargetConnection")
+    connection: Dict[str, Any] = {}
+    if _text(conn, "URL"):
+        connection["uRL"] = _text(conn, "URL")
+    ssl = _child(conn, "SSLInfo")
+    if ssl is not None:
+        connection["sSLInfo"] = {_lower_first(c["tag"]): c["text"] for c in ssl["children"]}
+    return {"name": root["attrib"].get("name"), "connection": connection}
+
+
+def _ref_or_text(node: Optional[Dict[str, Any]]) -> Optional[str]:
+    if node is None:
+        return None
+    return node["attrib"].get("ref") or node["text"]
+
+
+def _policy_summary(root: Dict[str, Any], file_stem: str) -> Dict[str, Any]:
+    """One policy file in the shape of an entry of proxy.get_policies_summary_for_proxy_revision."""
+    policy_type = root["tag"]
+    name = root["attrib"].get("name") or file_stem
+    allow = [
+        _text(rule, "SourceAddress")
+        for rule in _children(_child(root, "IPRules"), "MatchRule")
+        if rule["attrib"].get("action", "").upper() == "ALLOW"
+    ] if policy_type == "AccessControl" else None
+    return {
+        "policy_file_name": name,
+        "policy_name": name,
+        "policy_type": policy_type,
+        "enabled": root["attrib"].get("enabled", "true"),
+        "callout_url": _text(root, "HTTPTargetConnection", "URL") if policy_type == "ServiceCallout" else None,
+        "api_key": _ref_or_text(_child(root, "APIKey")) if policy_type == "VerifyAPIKey" else None,
+        "shared_flow_bundle": _text(root, "SharedFlowBundle") if policy_type == "FlowCallout" else None,
+        "cors_policy": name if policy_type == "CORS" else None,
+        "ip_allow_list": [a for a in allow if a] if allow is not None else None,
+        "rate_limit": _ref_or_text(_child(root, "Rate")) if policy_type == "SpikeArrest" else None,
+    }
+
+
+def parse_proxy_bundle(bundle: bytes) -> Dict[str, Any]:
+    """
+    Parses a revision bundle zip into the artifacts the management API calls return:
+    {"policies": [summary, ...], "endpoints": {name: details}, "targets": {name: details}}.
+    Pure and picklable, so it can run in a process pool.
+    """
+    out: Dict[str, Any] = {"policies": [], "endpoints": {}, "targets": {}}
+    with zipfile.ZipFile(io.BytesIO(bundle)) as zf:
+        for info in sorted(zf.infolist(), key=lambda i: i.filename):
+            if info.is_dir() or not info.filename.endswith(".xml"):
+                continue
+            folder = posixpath.basename(posixpath.dirname(info.filename))
+            if folder not in ("proxies", "targets", "policies"):
+                continue
+            stem = posixpath.splitext(posixpath.basename(info.filename))[0]
+            with zf.open(info) as fp:
+                root = _read_tree(fp)
+            if folder == "proxies":
+                out["endpoints"][root["attrib"].get("name") or stem] = _proxy_endpoint(root)
+            elif folder == "targets":
+                out["targets"][root["attrib"].get("name") or stem] = _target_endpoint(root)
+            else:
+                out["policies"].append(_policy_summary(root, stem))
+    return out
@@ -0,0 +1,61 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Optional
+
+from .disk_cache import DiskCache
+from .env_constants import LOCAL_CACHE_DIR
+from .env_utils import get_env_bool, get_env_int
+
+
+class ApigeeArtifactCache:
+    """
+    Persistent cache of Apigee management responses for one proxy revision (policy summaries,
+    endpoint and target details), keyed by org, proxy, revision and resource.
+    Revisions are immutable, so entries never expire; the store is only bounded by size
+    (APIGEE_ARTIFACT_CACHE_MAX_MB, least recently used entries evicted first).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        path = path or os.getenv("APIGEE_ARTIFACT_CACHE_PATH") or os.path.join(LOCAL_CACHE_DIR, "apigee_artifacts.sqlite")
+        max_bytes = max_bytes or get_env_int("APIGEE_ARTIFACT_CACHE_MAX_MB", 256) * 1024 * 1024
+        self.store = DiskCache(path, max_bytes)
+
+    @staticmethod
+    def key_for(org: str, proxy: str, revision: str, resource: str) -> str:
+        return "\x1f".join([org, proxy, str(revision), resource])
+
+    def get_or_fetch(self, org: str, proxy: str, revision: str, resource: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Cached response, or fetch() stored before it is returned (errors are not cached).
+        A fresh response is returned as it reads back from the store, so hits and misses look
+        alike; one json cannot encode raises TypeError rather than being cached as a string.
+        """
+        key = self.key_for(org, proxy, revision, resource)
+        value = self.store.get(key)
+        if value is None:
+            try:
+                value = json.loads(json.dumps(fetch()))
+            except TypeError as e:
+                raise TypeError(f"[apigee] {resource} for {proxy} rev {revision} is not JSON-serializable: {e}") from e
+            self.store.set(key, value)
+        return value
+
+
+_CACHE: Optional[ApigeeArtifactCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_artifact_cache() -> Optional[ApigeeArtifactCache]:
+    """Process-wide artifact cache, or None when APIGEE_ARTIFACT_CACHE_BYPASS is set or the cache cannot be opened."""
+    global _CACHE
+    if get_env_bool("APIGEE_ARTIFACT_CACHE_BYPASS", False):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                _CACHE = ApigeeArtifactCache()
+            except Exception as e:
+                print(f"[apigee] artifact cache unavailable: {e}")
+                return None
+        return _CACHE
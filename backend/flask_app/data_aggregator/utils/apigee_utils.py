@@ -2,10 +2,14 @@ import logging
 import re
 import os
 import inspect
-from typing import Any, List
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
 
 from apigee.apigee_api import ApigeeManagement
 
+from .apigee_bundle import download_proxy_bundle, parse_proxy_bundle
+from .apigee_cache import get_artifact_cache
+
 log = logging.getLogger()
 
 
@@ -164,71 +168,163 @@ def get_all_active_proxies_by_deployment_env(all_info: dict, deployment_env: str
     return all_active_proxies
 
 
-def fetch_apigee_xml_data(apigee_obj, proxy_name: str, revision: str) -> tuple[dict, dict]:
+def _fetch_each(fn: Callable[[Any], Any], items: Iterable[Any], executor: Optional[Executor] = None) -> list:
+    """Calls fn for every item, concurrently when an executor is given. Results keep the order of items."""
+    items = list(items)
+    if executor is None or len(items) < 2:
+        return [fn(item) for item in items]
+    return list(executor.map(fn, items))
+
+
+def _revision_artifact(cache_org: Optional[str], proxy: str, revision: str, resource: str, fetch: Callable[[], Any]) -> Any:
+    """fetch() through the artifact cache when cache_org identifies the Apigee org, else directly."""
+    cache = get_artifact_cache() if cache_org else None
+    if cache is None:
+        return fetch()
+    return cache.get_or_fetch(cache_org, proxy, revision, resource, fetch)
+
+
+def fetch_apigee_xml_data(apigee_obj, proxy_name: str, revision: str, max_workers: int = 1,
+                          cache_org: Optional[str] = None, keep_xml: bool = False) -> tuple[dict, dict]:
+    # With max_workers > 1 the endpoint and target sub-requests of this revision are issued
+    # concurrently through the same apigee_obj (and therefore the same HTTP connection pool).
+    # cache_org (e.g. "planet/org") enables the on-disk artifact cache for this revision.
+    # The endpoint XML dicts are only returned with keep_xml; otherwise the second value is {}.
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="proxy-fetch") if max_workers > 1 else None
     try:
-        policies = apigee_obj.proxy.get_policies_summary_for_proxy_revision(proxy_name, revision)
-        used_policies, virtual_hosts, xml_dicts = parse_apigee_xml_data(apigee_obj, policies, proxy_name, revision)
-        target_details = find_proxy_target_details(apigee_obj, proxy_name, revision)
+        targets_future = executor.submit(find_proxy_target_details, apigee_obj, proxy_name, revision, executor,
+                                         cache_org) if executor else None
+        policies = _revision_artifact(
+            cache_org, proxy_name, revision, "policies",
+            lambda: apigee_obj.proxy.get_policies_summary_for_proxy_revision(proxy_name, revision))
+        used_policies, virtual_hosts, xml_dicts = parse_apigee_xml_data(apigee_obj, policies, proxy_name, revision,
+                                                                        executor, cache_org, keep_xml)
+        if targets_future is not None:
+            target_details = targets_future.result()
+        else:
+            target_details = find_proxy_target_details(apigee_obj, proxy_name, revision, cache_org=cache_org)
         output_json = {
             "policies": used_policies,
             "virtual_hosts": list(virtual_hosts),
             "targets": target_details
         }
     except Exception as e:
+        # raised, not returned empty: the catalog run records harvested revisions and would never retry it
         log.error(f"Error with {proxy_name} - {revision}: {e}")
-        output_json = {
-            "policies": [],
-            "virtual_hosts": [],
-            "targets": []
-        }
-        xml_dicts = {}
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+    return output_json, xml_dicts
+
+
+def fetch_apigee_bundle_data(apigee_obj, proxy_name: str, revision: str, parse_pool: Optional[Executor] = None,
+                             cache_org: Optional[str] = None, keep_xml: bool = False) -> tuple[dict, dict]:
+    """
+    Same result as fetch_apigee_xml_data from a single bundle download: the revision zip is
+    parsed locally (in parse_pool when given, e.g. a ProcessPoolExecutor). As with
+    fetch_apigee_xml_data, errors are raised so the caller can retry the revision later.
+    """
+    def _download_and_parse():
+        bundle = download_proxy_bundle(apigee_obj, proxy_name, revision)
+        if parse_pool is None:
+            return parse_proxy_bundle(bundle)
+        return parse_pool.submit(parse_proxy_bundle, bundle).result()
+
+    artifacts = _revision_artifact(cache_org, proxy_name, revision, "bundle", _download_and_parse)
+    used_policies, virtual_hosts, xml_dicts = resolve_endpoint_policies(artifacts["policies"],
+                                                                        artifacts["endpoints"].items(), keep_xml)
+    output_json = {
+        "policies": used_policies,
+        "virtual_hosts": list(virtual_hosts),
+        "targets": {name: summarize_target(raw) for name, raw in artifacts["targets"].items()},
+    }
     return output_json, xml_dicts
 
 
 def parse_apigee_xml_data(apigee: ApigeeManagement, policies: list[dict], proxy: str,
-                          revision: str) -> tuple[list[dict], set[Any], dict]:
-    flow_policies = []
-    used_policies = []
-    virtual_hosts = []
+                          revision: str, executor: Optional[Executor] = None,
+                          cache_org: Optional[str] = None, keep_xml: bool = False) -> tuple[list[dict], set[Any], dict]:
+    endpoints = _revision_artifact(cache_org, proxy, revision, "endpoints",
+                                   lambda: list(apigee.proxy.get_proxy_endpoints(proxy, revision)))
+
+    def _details(api_proxy):
+        return _revision_artifact(cache_org, proxy, revision, f"endpoint/{api_proxy}",
+                                  lambda: apigee.proxy.get_proxy_endpoint_details(proxy, revision, api_proxy))
+
+    if executor is None:
+        # fetched lazily so only one endpoint's details are held at a time
+        endpoint_details = ((api_proxy, _details(api_proxy)) for api_proxy in endpoints)
+    else:
+        endpoint_details = zip(endpoints, _fetch_each(_details, endpoints, executor))
+    return resolve_endpoint_policies(policies, endpoint_details, keep_xml)
+
+
+def _step_names(container) -> list:
+    return [step['Step']['name'] for step in safe_open_xml_list(container, ['request', 'children'])]
+
+
+def resolve_endpoint_policies(policies: list[dict], endpoint_details: Iterable[tuple[str, dict]],
+                              keep_xml: bool = False) -> tuple[list[dict], set[Any], dict]:
+    """
+    Returns the policies attached by any endpoint (each once, in first-use order), the union of
+    the endpoints' virtual hosts, and {endpoint: details} when keep_xml is set.
+    A policy's application_level is 'flow' if any endpoint runs it in a conditional flow,
+    else 'global' (PreFlow only). Runs in time linear in policies plus steps.
+    """
+    by_name: dict[Any, list[int]] = {}
+    for i, policy in enumerate(policies):
+        by_name.setdefault(policy['policy_file_name'], []).append(i)
+
+    flow_names = set()
+    used: dict[int, dict] = {}  # policy index -> policy, in first-use order
+    virtual_hosts = set()
     xml_dict = {}
 
-    for api_proxy in apigee.proxy.get_proxy_endpoints(proxy, revision):
-        xmldict = apigee.proxy.get_proxy_endpoint_details(proxy, revision, api_proxy)
-
-        global_policies = [step['Step']['name'] for step in
-                           safe_open_xml_list(xmldict.get('preFlow', {}), ['request', 'children']) if 'preFlow' in xmldict]
+    for api_proxy, xmldict in endpoint_details:
+        attached = set(_step_names(xmldict.get('preFlow', {})))
         flows = safe_open_xml_list(xmldict['flows'], []) if 'flows' in xmldict and xmldict['flows'] else []
         for flow in flows:
             if 'request' not in flow or not flow['request'] or 'children' not in flow['request']:
                 continue
-            steps = safe_open_xml_list(flow['request'], ['children'])
-            flow_policies = [*flow_policies, *[step['Step']['name'] for step in steps]]
-        for policy in policies:
-            if policy['policy_file_name'] in global_policies:
-                policy['application_level'] = 'global'
-                used_policies.append(policy)
-            if policy['policy_file_name'] in flow_policies:
-                policy['application_level'] = 'flow'
-                used_policies.append(policy)
-        proxy_virtual_hosts = xmldict['connection']['virtualHost'] if 'connection' in xmldict and 'virtualHost' in \
-                                                                      xmldict['connection'] else []
-        virtual_hosts = [*virtual_hosts, *proxy_virtual_hosts]
-        xml_dict[api_proxy] = xmldict
-
-    return used_policies, set(virtual_hosts), xml_dict
-
-
-def find_proxy_target_details(apigee: ApigeeManagement, proxy: str, revision: str) -> List[dict]:
+            names = _step_names(flow)
+            flow_names.update(names)
+            attached.update(names)
+        new = sorted(i for name in attached for i in by_name.get(name, ()) if i not in used)
+        for i in new:
+            used[i] = policies[i]
+        connection = xmldict.get('connection') or {}
+        virtual_hosts.update(connection.get('virtualHost') or [])
+        if keep_xml:
+            xml_dict[api_proxy] = xmldict
+
+    for policy in used.values():
+        policy['application_level'] = 'flow' if policy['policy_file_name'] in flow_names else 'global'
+    return list(used.values()), virtual_hosts, xml_dict
+
+
+def find_proxy_target_details(apigee: ApigeeManagement, proxy: str, revision: str,
+                              executor: Optional[Executor] = None, cache_org: Optional[str] = None) -> List[dict]:
     target_details = {}
-    for target in apigee.proxy.get_proxy_targets(proxy, revision):
-        raw_details = apigee.proxy.get_proxy_target_by_name(proxy, revision, target)
-        target_details[target] = {
-            "url": raw_details['connection']['uRL'] if 'uRL' in raw_details['connection'] else 'N/A',
-            "ssl_info": raw_details['connection']['sSLInfo'] if 'sSLInfo' in raw_details['connection'] else None,
-        }
+    targets = _revision_artifact(cache_org, proxy, revision, "targets",
+                                 lambda: list(apigee.proxy.get_proxy_targets(proxy, revision)))
+    details = _fetch_each(
+        lambda target: _revision_artifact(
+            cache_org, proxy, revision, f"target/{target}",
+            lambda: apigee.proxy.get_proxy_target_by_name(proxy, revision, target)),
+        targets, executor)
+    for target, raw_details in zip(targets, details):
+        target_details[target] = summarize_target(raw_details)
     return target_details
 
 
+def summarize_target(raw_details: dict) -> dict:
+    return {
+        "url": raw_details['connection']['uRL'] if 'uRL' in raw_details['connection'] else 'N/A',
+        "ssl_info": raw_details['connection']['sSLInfo'] if 'sSLInfo' in raw_details['connection'] else None,
+    }
+
+
 def identify_rate_limit(policies):
     for policy in policies:
         if policy['policy_type'] == 'SpikeArrest' and policy['rate_limit']:
@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Optional
+
+
+class DiskCache:
+    """
+    Small persistent key/value cache backed by one SQLite file.
+    - Values are JSON, stored zlib-compressed; set() raises TypeError for anything json cannot encode.
+    - Entries may carry an expiry (ttl seconds); expired entries are misses.
+    - Total payload size is bounded by max_bytes; least recently used entries are evicted first.
+      The size total is kept in memory; once it passes the bound, entries are evicted down to
+      EVICT_TO of it, and the total is re-read from the file (at most every RESYNC_SECONDS) so
+      writes by other processes are accounted for.
+    Safe to share between threads of one process; SQLite serialises writers across processes.
+    """
+
+    EVICT_BATCH = 256
+    EVICT_TO = 0.9
+    RESYNC_SECONDS = 60.0
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute("""
+        create table if not exists cache_entries(
+          key text primary key,
+          payload blob not null,
+          size integer not null,
+          created_at real not null,
+          expires_at real,
+          accessed_at real not null
+        )""")
+        self._db.execute("create index if not exists cache_entries_accessed on cache_entries(accessed_at)")
+        self._db.commit()
+        self._total = self._stored_bytes()
+        self._synced_at = time.monotonic()
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute("select coalesce(sum(size), 0) from cache_entries").fetchone()[0]
+
+    def _size_of(self, key: str) -> int:
+        row = self._db.execute("select size from cache_entries where key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "select payload, expires_at, size from cache_entries where key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, expires_at, size = row
+            if expires_at is not None and expires_at <= now:
+                self._db.execute("delete from cache_entries where key = ?", (key,))
+                self._db.commit()
+                self._total -= size
+                return None
+            self._db.execute("update cache_entries set accessed_at = ? where key = ?", (now, key))
+            self._db.commit()
+        return json.loads(zlib.decompress(payload))
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            replaced = self._size_of(key)
+            self._db.execute(
+                "insert or replace into cache_entries(key, payload, size, created_at, expires_at, accessed_at) "
+                "values (?, ?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now + ttl if ttl else None, now),
+            )
+            self._total += len(payload) - replaced
+            if self._total > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._total -= self._size_of(key)
+            self._db.execute("delete from cache_entries where key = ?", (key,))
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Drops expired entries, then least recently used ones in batches, until under EVICT_TO * max_bytes."""
+        if time.monotonic() - self._synced_at >= self.RESYNC_SECONDS:
+            self._db.execute("delete from cache_entries where expires_at is not null and expires_at <= ?", (time.time(),))
+            self._total = self._stored_bytes()
+            self._synced_at = time.monotonic()
+        target = self.max_bytes * self.EVICT_TO
+        while self._total > target:
+            batch = self._db.execute(
+                "select key, size from cache_entries order by accessed_at limit ?", (self.EVICT_BATCH,)
+            ).fetchall()
+            if not batch:
+                break
+            victims = []
+            for key, size in batch:
+                victims.append((key,))
+                self._total -= size
+                if self._total <= target:
+                    break
+            self._db.executemany("delete from cache_entries where key = ?", victims)
@@ -7,4 +7,25 @@ def get_my_env():
     if "EPAAS_ENV" in os.environ:
         return os.environ["EPAAS_ENV"][0:2].lower()
     else:
-        return LOCAL_ENV
\ No newline at end of file
+        return LOCAL_ENV
+
+
+def get_env_int(name: str, default: int, minimum: int = 1) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, "") or default))
+    except ValueError:
+        print(f"[config] {name} is not an integer; using {default}")
+        return default
+
+
+def get_env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        print(f"[config] {name} is not a number; using {default}")
+        return default
+
+
+def get_env_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    return default if v is None or not v.strip() else v.strip().lower() in ("1", "true", "t", "yes", "y")
@@ -0,0 +1,103 @@
+import math
+import zlib
+from hashlib import blake2b
+from typing import Iterable
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def precision_for_error(rel_error: float) -> int:
+    """Smallest precision whose standard error (1.04 / sqrt(2**p)) is within rel_error."""
+    p = math.ceil(math.log2((1.04 / rel_error) ** 2)) if rel_error > 0 else MAX_PRECISION
+    return min(MAX_PRECISION, max(MIN_PRECISION, p))
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch over 64-bit blake2b hashes.
+    - 2**precision one-byte registers, so memory is fixed whatever the input size.
+    - Sketches merge by register-wise max; a merge of mixed precisions folds to the lower one.
+    - to_bytes() is compact for sparse sketches (zlib), e.g. a proxy with a handful of consumers.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.p = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        h = int.from_bytes(blake2b(str(value).encode(), digest_size=8).digest(), "big")
+        rest_bits = 64 - self.p
+        idx = h >> rest_bits
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def update(self, values: Iterable[str]) -> "HyperLogLog":
+        for v in values:
+            self.add(v)
+        return self
+
+    def reduce(self, precision: int) -> "HyperLogLog":
+        """Equivalent sketch at a lower precision (as if built with it from the same values)."""
+        if precision == self.p:
+            return self
+        if precision > self.p:
+            raise ValueError("cannot raise the precision of a sketch")
+        shift = self.p - precision
+        out = HyperLogLog(precision)
+        for idx, rank in enumerate(self.registers):
+            if not rank:
+                continue
+            low = idx & ((1 << shift) - 1)
+            # the dropped index bits become the leading bits of the rank's bit string
+            new_rank = shift - low.bit_length() + 1 if low else rank + shift
+            j = idx >> shift
+            if new_rank > out.registers[j]:
+                out.registers[j] = new_rank
+        return out
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Union of both sketches, in place (self is reduced first if other has a lower precision)."""
+        if other.p < self.p:
+            reduced = self.reduce(other.p)
+            self.p, self.registers = reduced.p, reduced.registers
+        other = other.reduce(self.p)
+        regs = self.registers
+        for i, r in enumerate(other.registers):
+            if r > regs[i]:
+                regs[i] = r
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        estimate = _alpha(m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.p]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        sketch = cls(data[0])
+        registers = zlib.decompress(data[1:])
+        if len(registers) != len(sketch.registers):
+            raise ValueError("corrupt sketch")
+        sketch.registers = bytearray(registers)
+        return sketch
@@ -0,0 +1,144 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from . import apigee_utils as au
+
+_LOOPBACK_RE = re.compile(r'127\.0\.0\.1:(\d*)\/')
+_LOCALHOST_PORT_RE = re.compile(r'localhost:(\d*)\/')
+
+
+class _PrefixTrie:
+    """Character trie of URL prefixes; lookup returns the labels of every stored prefix of a string."""
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def add(self, prefix: str, label: str) -> None:
+        node = self.root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node.setdefault(None, set()).add(label)
+
+    def prefix_labels(self, text: str) -> Set[str]:
+        node = self.root
+        found = set(node.get(None, ()))
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                break
+            found.update(node.get(None, ()))
+        return found
+
+
+class PolicyClassifier:
+    """
+    Security and SSL classification of harvested proxies, compiled once from the bucket tables.
+    - Callout URL buckets become one prefix trie, shared flow bundles and virtual hosts
+      inverted indexes, so a policy or host is classified in one lookup instead of a scan
+      per bucket.
+    - policy_analysis / virtual_host_analysis return exactly what get_policy_analysis_dict /
+      get_virtual_host_analysis_dict return for the same tables (including normalising each
+      policy's callout_url in place).
+    Immutable after construction, so one instance can be shared between threads.
+    """
+
+    def __init__(self,
+                 security_types: Sequence[str] = au.APIGEE_SECURITY_TYPES,
+                 security_buckets: Dict[str, Dict[str, Iterable[str]]] = au.SECURITY_POLICY_BUCKETS,
+                 ssl_types: Sequence[str] = au.APIGEE_SSL_TYPES,
+                 ssl_buckets: Dict[str, Dict[str, Iterable[str]]] = au.SSL_BUCKETS):
+        self.security_types = [t for t in security_types if t != au.NONE]
+        self.security_columns = sorted(security_types)
+        self.ssl_columns = sorted(ssl_types)
+
+        self._callouts = _PrefixTrie()
+        self._bundles: Dict[Any, Set[str]] = {}
+        for security_type in self.security_types:
+            bucket = security_buckets.get(security_type) or {}
+            for url in bucket.get("callout_urls") or ():
+                self._callouts.add(url, security_type)
+            for bundle in bucket.get("shared_flow_bundles") or ():
+                self._bundles.setdefault(bundle, set()).add(security_type)
+
+        # first bucket (in table order) listing a host wins, as in sort_virtual_hosts
+        self._host_types: Dict[str, str] = {}
+        for ssl_type, bucket in ssl_buckets.items():
+            for host in bucket.get("hosts") or ():
+                self._host_types.setdefault(host, ssl_type)
+
+    # ---------------- policies ----------------
+
+    @staticmethod
+    def _normalized_callout(policy: Dict[str, Any]) -> str:
+        return _LOCALHOST_PORT_RE.sub('localhost/', _LOOPBACK_RE.sub('localhost/', str(policy['callout_url'])))
+
+    def _policy_types(self, policy: Dict[str, Any]) -> Set[str]:
+        types = set()
+        if policy.get('cors_policy') and str(policy['cors_policy']).lower() != "none":
+            types.add(au.APIGEE_CORS)
+        if au.APIGEE_OAUTH in self.security_types and au.check_for_oauth2(policy):
+            types.add(au.APIGEE_OAUTH)
+        if au.VERIFY_API_KEY in self.security_types and policy.get('api_key') and policy['api_key'].lower() != "none":
+            types.add(au.VERIFY_API_KEY)
+        if au.IP_ALLOW_LIST in self.security_types and policy.get('ip_allow_list') not in (None, []):
+            types.add(au.IP_ALLOW_LIST)
+        try:
+            types |= self._bundles.get(policy.get('shared_flow_bundle'), set())
+        except TypeError:  # unhashable value: matches no bundle
+            pass
+        callout_url = policy.get('callout_url')
+        if callout_url:
+            types |= self._callouts.prefix_labels(str(callout_url))
+        return types
+
+    def security_types_used(self, policies: Iterable[Dict[str, Any]]) -> Set[str]:
+        """Same set as identity_security_policies."""
+        used: Set[str] = set()
+        for policy in policies:
+            policy['callout_url'] = self._normalized_callout(policy)
+            if policy['enabled'] == 'false':
+                continue
+            used |= self._policy_types(policy)
+        return used
+
+    def policy_analysis(self, policies: List[Dict[str, Any]]) -> List[Any]:
+        used = self.security_types_used(policies)
+        security_bool_list = [au.REPORT_CELL_TRUE if t in used else au.REPORT_CELL_FALSE for t in self.security_columns]
+        return [*security_bool_list, au.identify_rate_limit(policies), *au.identify_threat_protections(policies)]
+
+    # ---------------- virtual hosts ----------------
+
+    def ssl_types_used(self, virtual_hosts: Iterable[str]) -> Set[str]:
+        """Same set as sort_virtual_hosts."""
+        found = set()
+        for virtual_host in virtual_hosts:
+            ssl_type = self._host_types.get(virtual_host)
+            if ssl_type is None:
+                au.log.debug(f"{virtual_host} not found in buckets")
+            else:
+                found.add(ssl_type)
+        return found
+
+    def virtual_host_analysis(self, virtual_hosts: Iterable[str]) -> List[Any]:
+        used = self.ssl_types_used(virtual_hosts)
+        return [au.REPORT_CELL_TRUE if t in used else au.REPORT_CELL_FALSE for t in self.ssl_columns]
+
+    # ---------------- batches ----------------
+
+    def classify(self, parsed: Dict[str, Any]) -> Tuple[List[Any], List[Any]]:
+        """(policy analysis, virtual host analysis) of one fetch_apigee_xml_data result."""
+        return self.policy_analysis(parsed["policies"]), self.virtual_host_analysis(parsed["virtual_hosts"])
+
+    def classify_batch(self, parsed_proxies: Iterable[Dict[str, Any]]) -> List[Tuple[List[Any], List[Any]]]:
+        return [self.classify(parsed) for parsed in parsed_proxies]
+
+
+_DEFAULT: Optional[PolicyClassifier] = None
+
+
+def get_policy_classifier() -> PolicyClassifier:
+    """Process-wide classifier over the bucket tables get_policy_analysis_dict uses."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = PolicyClassifier()
+    return _DEFAULT
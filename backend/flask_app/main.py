@@ -1,21 +1,32 @@
 import sys
 from .data_aggregator.run_catalog import main as run_catalog_main
 from .data_aggregator.run_metrics import main as run_metrics_main
+from .data_aggregator.db import get_conn, apply_migrations, check_volume_metric_writes
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python -m backend.flask_app.main [catalog|metrics|both]")
+        print("Usage: python -m backend.flask_app.main [catalog|metrics|both|migrate] [--full] [--per-proxy]")
         return 2
     cmd = sys.argv[1].lower()
+    flags = {a.lower() for a in sys.argv[2:]}
+    full = "--full" in flags
+    per_proxy = "--per-proxy" in flags
     if cmd == "catalog":
-        run_catalog_main()
+        run_catalog_main(full=full)
         return 0
     if cmd == "metrics":
-        run_metrics_main()
+        run_metrics_main(full=full, per_proxy=per_proxy)
+        return 0
+    if cmd == "migrate":
+        # get_conn applies pending migrations on first use; this makes it explicit
+        with get_conn() as conn:
+            apply_migrations(conn)
+            check_volume_metric_writes(conn)
+        print("[db] schema up to date; volume metric writes checked")
         return 0
     if cmd == "both":
-        run_catalog_main()
-        run_metrics_main()
+        run_catalog_main(full=full)
+        run_metrics_main(full=full, per_proxy=per_proxy)
         return 0
     print(f"Unknown option: {cmd}")
     return 2